@@ -0,0 +1,110 @@
+# ---- admission.py ----
+# Admission control for exam start. At the start time the whole cohort
+# opens /exam/<id> at once; a token bucket per exam lets candidates in at
+# ADMISSION_RATE per second (bursts up to ADMISSION_BURST) and gives the
+# rest a ticket and their place in line, first come first served (a 429
+# with Retry-After; the ticket is returned as ?ticket=). Admitted
+# candidates are never queued again (reloads, autosaves, submits).
+# State is per process: with several workers the rate is per worker.
+import math
+import threading
+import time
+from collections import OrderedDict
+
+WAIT_TTL = 30           # seconds a ticket is held without a retry
+MAX_RETRY_AFTER = 10    # seconds; clients retry at least this often
+PRUNE_INTERVAL = 60     # seconds between sweeps for idle lines
+TICKET_HEADER = "X-Admission-Ticket"
+
+IN_LINE_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="{retry_after}; url=?ticket={ticket}">
+<title>Waiting to start</title></head>
+<body><p>You're in line to start this exam: position {position}.</p>
+<p>This page refreshes by itself; please keep it open.</p></body></html>
+"""
+
+
+class ExamLine:
+    """Token bucket and waiting line of one exam."""
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+        self.waiting = OrderedDict()    # ticket -> last seen, oldest ticket first
+        self.next_ticket = 1
+
+
+class Admission:
+    """Per-exam admission: admit(exam, ticket) -> (admitted, ticket, position, retry_after).
+
+    A candidate is let in when their place in line is covered by the tokens
+    available; positions come from ticket numbers, so a check is O(1).
+    Tickets not retried within wait_ttl are dropped from the head of the
+    line. Idle lines (nobody waiting, bucket full again) are dropped, as a
+    new line would be the same. rate=0 admits everyone.
+    """
+
+    def __init__(self, rate, burst, wait_ttl=WAIT_TTL, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.wait_ttl = wait_ttl
+        self.clock = clock
+        self._lines = {}
+        self._lock = threading.Lock()
+        self._pruned = clock()
+        self.admitted = 0
+        self.queued = 0     # "in line" responses
+
+    def admit(self, exam, ticket=None):
+        if not self.rate:
+            return True, None, 0, 0
+        now = self.clock()
+        with self._lock:
+            if now - self._pruned >= PRUNE_INTERVAL:
+                self._prune(now)
+            line = self._lines.get(exam)
+            if line is None:
+                line = self._lines[exam] = ExamLine(self.burst, now)
+            line.tokens = min(self.burst, line.tokens + (now - line.updated) * self.rate)
+            line.updated = now
+
+            # Drop abandoned tickets from the head of the line
+            while line.waiting:
+                head, seen = next(iter(line.waiting.items()))
+                if now - seen <= self.wait_ttl:
+                    break
+                del line.waiting[head]
+
+            if ticket not in line.waiting:
+                if not line.waiting and line.tokens >= 1:
+                    # Nobody waiting: straight in
+                    line.tokens -= 1
+                    self.admitted += 1
+                    return True, None, 0, 0
+                ticket = line.next_ticket
+                line.next_ticket += 1
+            line.waiting[ticket] = now
+
+            position = ticket - next(iter(line.waiting)) + 1
+            if position <= line.tokens:
+                del line.waiting[ticket]
+                line.tokens -= 1
+                self.admitted += 1
+                return True, None, 0, 0
+
+            self.queued += 1
+            retry_after = min(max(math.ceil((position - line.tokens) / self.rate), 1), MAX_RETRY_AFTER)
+            return False, ticket, position, retry_after
+
+    def _prune(self, now):
+        """Drop lines with no live tickets whose bucket has refilled."""
+        refill = self.burst / self.rate
+        for exam, line in list(self._lines.items()):
+            if now - line.updated >= max(refill, self.wait_ttl):
+                del self._lines[exam]
+        self._pruned = now
+
+    def stats(self):
+        with self._lock:
+            waiting = {str(exam): len(line.waiting) for exam, line in self._lines.items() if line.waiting}
+        return {"admitted": self.admitted, "queued": self.queued, "waiting": waiting}
@@ -1,47 +1,60 @@
-from flask import Flask
-from pymongo import MongoClient
-from datetime import datetime
-
-app = Flask(__name__)
-app.secret_key = "supersecretkey"
+import logging
 
-# MongoDB setup
-client = MongoClient("mongodb://localhost:27017/")
-db = client["EduAssessDB"]
+from flask import Flask
+from pymongo.errors import PyMongoError
+from config import Config
+from extensions import mongo
+from grading import AnswerKey
+from schedule import exam_status
+from timer import seconds_left
 
-# Collections
-exams_collection = db["exams"]
-exam_results_collection = db["exam_results"]
+# -------------------------------------------------------------
+# Application factory
+# -------------------------------------------------------------
+def create_app(config=None):
+    """Create the Flask app; config overrides Config (a dict or an object)."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # MongoDB connects lazily on first use, one pool per app and process
+    client = mongo.init_app(app)
+
+    if app.config['MONGO_ENSURE_INDEXES']:
+        from indexes import reconcile
+        try:
+            report = reconcile(client.db)
+            logging.getLogger(__name__).info("Indexes created: %s", report['created'] or "none")
+        except PyMongoError as exc:
+            # Serve anyway; the routes work without indexes, only slower
+            logging.getLogger(__name__).warning("Index reconcile failed: %s", exc)
+
+    import metrics
+    import routes
+    metrics.init_app(app)
+    routes.init_app(app)
+    return app
 
 # -------------------------------------------------------------
 # Helper functions
 # -------------------------------------------------------------
 def calculate_score(questions, answers):
     """Calculate score based on correct answers."""
-    score = 0
-    for i, q in enumerate(questions):
-        if i < len(answers) and answers[i] == q.get("answer"):
-            score += 1
-    return score
+    return AnswerKey(questions).score_list(answers)
 
 def get_exam_status(start_time, end_time):
     """Return exam status: Upcoming, Active, or Ended"""
-    now = datetime.now()
-    if now < start_time:
-        return "Upcoming"
-    elif start_time <= now <= end_time:
-        return "Active"
-    else:
-        return "Ended"
+    return exam_status(start_time, end_time)
 
 def remaining_seconds(end_time):
-    """Return number of seconds left for the exam."""
-    now = datetime.now()
-    remaining = (end_time - now).total_seconds()
-    return max(int(remaining), 0)
+    """Return number of seconds left for the exam (see timer.TimerService for per-student deadlines)."""
+    return seconds_left(end_time)
 
-# Import routes after app and db are initialized
-from routes import *
+# Default app for 'flask --app app run' and 'gunicorn app:app'
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
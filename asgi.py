@@ -0,0 +1,228 @@
+# ---- asgi.py ----
+# Async serving mode: the exam routes on Quart (ASGI) with non-blocking MongoDB
+# I/O through pymongo's AsyncMongoClient. The Flask app in app.py is unchanged.
+# Run with: hypercorn asgi:app
+import asyncio
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from jinja2 import TemplateNotFound
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import Primary
+from quart import Quart, make_response, render_template, request
+
+from config import Config
+from dal import RESULT_FIELDS, ExamStore, secondary_reads
+from events import KEEPALIVE, AsyncSubscriber, ExamEventHub, format_sse
+from exam_cache import ExamCache
+from extensions import client_options
+from fragments import FRAGMENT_TEMPLATE, FragmentCache
+from listing import DASHBOARD_FIELDS, PAGE_SIZE, STATUSES, page_query, scope_filter, split_page, student_scope_pipeline
+from metrics import CONTENT_TYPE, metrics
+from stats import STATS, stats_update
+from timer import TimerService
+from views import STUDENT_ID, dashboard_exam, exam_page, form_answers, grade_submission
+
+app = Quart(__name__)
+app.config.from_object(Config)
+
+exam_cache = ExamCache()
+fragment_cache = FragmentCache(directory=app.config["FRAGMENT_CACHE_DIR"])
+
+
+@app.before_serving
+async def connect():
+    # Created inside the server's event loop
+    app.mongo = AsyncMongoClient(app.config["MONGO_URI"], **client_options(app.config))
+    app.db = app.mongo[app.config["MONGO_DB"]]
+    # Same read routing as dal.ExamStore: dashboards from replicas, exam
+    # definitions (cached answer keys) from the primary
+    secondary = secondary_reads(app.config)
+    app.exams = app.db.get_collection("exams", read_preference=secondary)
+    app.students = app.db.get_collection("students", read_preference=secondary)
+    app.exam_definitions = app.db.get_collection("exams", read_preference=Primary())
+
+    # The event hub's per-exam watchers and the timer service run in threads
+    # with a sync client; the open streams themselves are only coroutines
+    app.sync_mongo = MongoClient(app.config["MONGO_URI"], connect=False, **client_options(app.config))
+    sync_db = app.sync_mongo[app.config["MONGO_DB"]]
+    app.event_hub = ExamEventHub(sync_db)
+    app.sync_store = ExamStore(sync_db, app.config)
+    app.timers = TimerService(sync_db, on_expire=auto_submit)
+    await asyncio.to_thread(app.timers.load)
+    app.timers.run()
+
+
+@app.after_serving
+async def disconnect():
+    await app.mongo.close()
+    app.sync_mongo.close()
+
+
+def auto_submit(exam, student):
+    """Grade and record what the student autosaved when their time ran out (timer thread)."""
+    definition = exam_cache.get(app.sync_store.exam_definitions, exam)
+    if not definition:
+        return
+    draft = app.sync_store.exam_drafts.find_one({"exam": exam, "student": student}, {"answers": 1})
+    answers = draft.get('answers', {}) if draft else {}
+    result, submission = grade_submission(definition, student, answers, datetime.now())
+    result['status'] = "AUTO_SUBMITTED"
+    app.sync_store.record_submission(result, submission)
+
+
+async def student_scope(student_code):
+    cursor = await app.students.aggregate(student_scope_pipeline(student_code))
+    found = await cursor.to_list(length=1)
+    return scope_filter(found[0] if found else None)
+
+
+# Dashboard route
+@app.route('/')
+async def dashboard():
+    now = datetime.now()
+    cursor = request.args.get('cursor')
+
+    # One status tab per page; without one, show the first page of each
+    status = request.args.get('status')
+    statuses = [status] if status in STATUSES else list(STATUSES)
+
+    # Only the exams this student sits or is enrolled for
+    scope = await student_scope(STUDENT_ID)
+
+    try:
+        queries = [page_query(s, now, cursor if status else None, scope) for s in statuses]
+    except ValueError:
+        return "Invalid page cursor"
+
+    # The status tabs are independent queries, so run them concurrently
+    pages = await asyncio.gather(*(
+        app.exams.find(query, DASHBOARD_FIELDS).sort(sort).limit(PAGE_SIZE + 1).to_list(length=None)
+        for query, sort in queries
+    ))
+
+    exams = []
+    next_cursors = {}
+    for exam_status, docs in zip(statuses, pages):
+        page, next_cursors[exam_status] = split_page(docs)
+        exams.extend(dashboard_exam(exam, exam_status) for exam in page)
+
+    return await render_template('student_exam.html', exams=exams, status=status, next_cursors=next_cursors)
+
+
+# Start exam route
+@app.route('/exam/<exam_id>')
+async def start_exam(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return "Invalid exam ID"
+
+    definition = await exam_cache.aget(app.exam_definitions, oid)
+    if not definition:
+        return "Exam not found!"
+
+    # Cached question body; without the fragment template the page renders
+    # the questions itself
+    try:
+        fragment = await fragment_cache.aget(
+            definition, lambda: render_template(FRAGMENT_TEMPLATE, questions=definition.questions)
+        )
+    except TemplateNotFound:
+        fragment = None
+    # The student's deadline is fixed on first open (see timer.py); its
+    # reads and writes are blocking, so they run in a thread
+    timer = await asyncio.to_thread(app.timers.start, definition, STUDENT_ID)
+    exam_doc = exam_page(definition, datetime.now(), TimerService.status(timer), questions=fragment is None)
+    draft = await app.db["exam_drafts"].find_one({"exam": oid, "student": STUDENT_ID}, {"answers": 1})
+    return await render_template('start_exam.html', exam=exam_doc,
+                                 questions_html=fragment.html if fragment else None,
+                                 answers=draft.get('answers', {}) if draft else {})
+
+
+async def first_write(collection, key, doc):
+    """Async dal.first_write: insert doc under key unless stored; True if this call did."""
+    try:
+        written = await collection.update_one(key, {"$setOnInsert": doc}, upsert=True)
+    except DuplicateKeyError:
+        return False
+    return written.upserted_id is not None
+
+
+# Submit exam route
+@app.route('/exam/<exam_id>/submit', methods=['POST'])
+async def submit_exam(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return "Invalid exam ID"
+
+    db = app.db
+    definition = await exam_cache.aget(app.exam_definitions, oid)
+    if not definition:
+        return "Exam not found!"
+
+    now = datetime.now()
+    key = {"exam": oid, "student": STUDENT_ID, "attempt": 1}
+
+    # A duplicate submit (double click, client retry) gets the stored result, ungraded
+    stored = await db["exam_results"].find_one(key, RESULT_FIELDS)
+    if stored:
+        return await render_template('exam_result.html', score=stored['score'], total=stored['total'])
+
+    # The submitted form wins; the autosaved draft fills in what it lacks
+    draft = await db["exam_drafts"].find_one({"exam": oid, "student": STUDENT_ID}, {"answers": 1})
+    draft = draft.get('answers', {}) if draft else {}
+    answers = {**draft, **form_answers(definition.answer_key, await request.form)}
+
+    result, submission = grade_submission(definition, STUDENT_ID, answers, now, key['attempt'])
+    await asyncio.to_thread(app.timers.complete, oid, STUDENT_ID)
+    await first_write(db["exam_submissions"], key, submission)
+    if await first_write(db["exam_results"], key, result):
+        query, update = stats_update(result)
+        await db[STATS].update_one(query, update, upsert=True)
+    else:
+        # A concurrent duplicate stored its result first
+        result = await db["exam_results"].find_one(key, RESULT_FIELDS)
+
+    return await render_template('exam_result.html', score=result['score'], total=result['total'])
+
+
+# Live events route (Server-Sent Events): pause/resume, chat, time extensions
+@app.route('/exam/<exam_id>/events')
+async def exam_events(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return "Invalid exam ID", 400
+
+    # No watcher thread for exams that don't exist
+    if not await exam_cache.aget(app.exam_definitions, oid):
+        return "Exam not found!", 404
+
+    subscriber = app.event_hub.subscribe(oid, AsyncSubscriber(STUDENT_ID, asyncio.get_running_loop()))
+
+    async def stream():
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE)
+                    yield format_sse(event).encode()
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            app.event_hub.unsubscribe(oid, subscriber)
+
+    response = await make_response(stream(), {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    response.timeout = None  # streams stay open for the whole sitting
+    return response
+
+
+# MongoDB command counters (per-route timings are the Flask app's, see metrics.py)
+async def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+if app.config["METRICS_ENABLED"]:
+    app.add_url_rule('/metrics', view_func=metrics_endpoint)
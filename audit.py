@@ -0,0 +1,13 @@
+from datetime import datetime
+
+
+def audit(user_id=1, created=None):
+    """Audit fields every seeded document carries."""
+    now = datetime.now() if created is None else created
+    return {
+        "last_modification_user_id": user_id,
+        "last_modification_time": now,
+        "creation_time": now,
+        "is_active": True,
+        "is_deleted": False
+    }
@@ -0,0 +1,82 @@
+# ---- benchmarks/content_bandwidth.py ----
+# Bytes and server time per exam reload: the HTML start_exam page vs the
+# exam API, where a reload is one state call (the client refetches content
+# only when the state's hash changes) or, for a client that lost its cache
+# of the hash, state plus a content revalidation answered with a 304. Bytes
+# are shown raw and gzipped; CPU is the request thread's CPU time (the test
+# client runs the app in-process).
+# Needs a seeded database (python seed.py) and the site templates.
+# Run with: python -m benchmarks.content_bandwidth [reloads] [exam_id]
+import gzip
+import sys
+import time
+
+from app import app
+from extensions import mongo
+
+
+def measure(client, requests, n):
+    """Mean (raw bytes, gzipped bytes, wall ms, CPU ms) of a sequence of requests, repeated n times."""
+    raw = packed = 0
+    wall = cpu = 0.0
+    for _ in range(n):
+        for path, headers in requests():
+            start, start_cpu = time.perf_counter(), time.thread_time()
+            response = client.get(path, headers=headers)
+            wall += time.perf_counter() - start
+            cpu += time.thread_time() - start_cpu
+            if response.status_code >= 400:
+                sys.exit(f"{path}: HTTP {response.status_code}")
+            body = response.get_data()
+            raw += len(body)
+            packed += len(gzip.compress(body, 6)) if body else 0
+    return raw / n, packed / n, wall * 1000 / n, cpu * 1000 / n
+
+
+def main(n_reloads=200, exam_id=None):
+    if exam_id is None:
+        exam = mongo.db["exams"].find_one({"questions.0": {"$exists": True}}, {"_id": 1})
+        if not exam:
+            sys.exit("No exams with questions found, run seed.py first")
+        exam_id = str(exam['_id'])
+
+    client = app.test_client()
+    html = f"/exam/{exam_id}"
+    content = f"/api/exam/{exam_id}/content"
+    state = f"/api/exam/{exam_id}/state"
+    etags = {}
+
+    def content_request(fmt):
+        headers = {"Accept": fmt}
+        if fmt in etags:
+            headers["If-None-Match"] = f'"{etags[fmt]}"'
+        return content, headers
+
+    for fmt in ("application/json", "application/msgpack"):
+        response = client.get(content, headers={"Accept": fmt})
+        if response.status_code == 200:
+            etags[fmt] = response.get_etag()[0]
+
+    scenarios = [
+        ("html page", lambda: [(html, {})]),
+        ("api first load (json)", lambda: [(f"{state}?answers=1", {}), (content, {"Accept": "application/json"})]),
+        ("api reload (json)", lambda: [(state, {})]),
+        ("api revalidate (json)", lambda: [(state, {}), content_request("application/json")]),
+    ]
+    if "application/msgpack" in etags:
+        scenarios += [
+            ("api first load (msgpack)", lambda: [(f"{state}?answers=1&format=msgpack", {}),
+                                                  (content, {"Accept": "application/msgpack"})]),
+            ("api reload (msgpack)", lambda: [(f"{state}?format=msgpack", {})]),
+        ]
+
+    results = {label: measure(client, requests, n_reloads) for label, requests in scenarios}
+    base_raw, base_gzip, base_wall, base_cpu = results["html page"]
+    print(f"{'per load':<26} {'bytes':>9} {'gzip':>9} {'wall ms':>9} {'cpu ms':>9}   vs html (bytes, cpu)")
+    for label, (raw, packed, wall, cpu) in results.items():
+        print(f"{label:<26} {raw:9.0f} {packed:9.0f} {wall:9.3f} {cpu:9.3f}   "
+              f"{base_raw / max(raw, 1):6.1f}x {base_cpu / max(cpu, 1e-9):6.1f}x")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) if i == 0 else arg for i, arg in enumerate(sys.argv[1:])))
@@ -0,0 +1,123 @@
+# ---- benchmarks/duplicate_submits.py ----
+# Concurrency check for the duplicate-submission guard: parallel duplicate
+# submits of the same (exam, student, attempt), each with different answers,
+# straight through ExamStore and through the submit route. Exactly one
+# result, one submission and one stats count may exist per exam afterwards,
+# and every caller must see the first writer's score. Uses a scratch
+# database on the configured mongod (dropped afterwards), or mongomock.
+# Run with: python -m benchmarks.duplicate_submits [rounds] [concurrency] [--mongomock]
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest import mock
+
+SCRATCH_DB = "EduAssessBench_duplicates"
+OPTIONS = ["A", "B", "C", "D"]
+QUESTIONS = [{"question_text": f"Q{i}", "options": OPTIONS, "answer": OPTIONS[i % 4]} for i in range(4)]
+
+
+def make_exam(db):
+    now = datetime.now()
+    return db["exams"].insert_one({
+        "title": "Duplicate submit check", "questions": QUESTIONS, "version": 1,
+        "start_at": now, "end_at": now, "status": "ACTIVE",
+    }).inserted_id
+
+
+def answers_for(i):
+    """Thread i gets its own answers, so each would grade differently."""
+    return {f"q{idx}": OPTIONS[(idx + i) % 4] for idx in range(1, len(QUESTIONS) + 1)}
+
+
+def check(db, exam, label, scores=None):
+    """Count what was stored for one exam; returns a list of problems."""
+    problems = []
+    for name in ("exam_results", "exam_submissions"):
+        count = db[name].count_documents({"exam": exam})
+        if count != 1:
+            problems.append(f"{label}: {count} {name}")
+    stats = db["exam_stats"].find_one({"_id": exam}) or {}
+    if stats.get('count') != 1:
+        problems.append(f"{label}: exam_stats count {stats.get('count')}")
+    stored = db["exam_results"].find_one({"exam": exam}) or {}
+    if scores is not None and set(scores) != {stored.get('score')}:
+        problems.append(f"{label}: callers saw scores {sorted(set(scores))}, stored {stored.get('score')}")
+    return problems
+
+
+def store_round(app, db, concurrency):
+    """Parallel ExamStore.record_submission calls for one new exam."""
+    from routes import exam_cache, store
+    from views import STUDENT_ID, grade_submission
+
+    exam = make_exam(db)
+
+    def submit(i):
+        with app.app_context():
+            definition = exam_cache().get(db["exams"], exam)
+            result, submission = grade_submission(definition, STUDENT_ID, answers_for(i), datetime.now())
+            stored, _ = store().record_submission(result, submission)
+            return stored['score']
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        scores = list(pool.map(submit, range(concurrency)))
+    return check(db, exam, "store", scores)
+
+
+def plain_result(template, score=None, total=None, **context):
+    """Stand-in for the result page: just the score."""
+    return f"{score}"
+
+
+def route_round(app, db, concurrency):
+    """Parallel POSTs to /exam/<id>/submit for one new exam."""
+    exam = make_exam(db)
+    client = app.test_client()
+
+    def submit(i):
+        return client.post(f"/exam/{exam}/submit", data=answers_for(i))
+
+    # Read the score back from the page, rendered without the site templates
+    with mock.patch("routes.render_template", plain_result), ThreadPoolExecutor(concurrency) as pool:
+        responses = list(pool.map(submit, range(concurrency)))
+    problems = [f"route: HTTP {r.status_code}" for r in responses if r.status_code != 200]
+    scores = [float(r.get_data(as_text=True)) for r in responses if r.status_code == 200]
+    return problems + check(db, exam, "route", scores)
+
+
+def main(rounds=20, concurrency=16):
+    from app import create_app
+    from extensions import mongo
+    from indexes import create_indexes
+
+    app = create_app({"MONGO_DB": SCRATCH_DB})
+    db = mongo.db
+    db.client.drop_database(SCRATCH_DB)
+    create_indexes(db)
+
+    problems = []
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            problems += store_round(app, db, concurrency)
+            problems += route_round(app, db, concurrency)
+    finally:
+        db.client.drop_database(SCRATCH_DB)
+
+    elapsed = time.perf_counter() - started
+    print(f"{rounds * 2} exams x {concurrency} duplicate submits in {elapsed:.2f}s")
+    for problem in problems:
+        print(f"  ❌ {problem}")
+    print(f"{'❌' if problems else '✅'} {len(problems)} problems")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != "--mongomock"]
+    if "--mongomock" in sys.argv:
+        import mongomock
+        client = mongomock.MongoClient()
+        with mock.patch("extensions.MongoClient", return_value=client):
+            sys.exit(main(*(int(arg) for arg in args)))
+    sys.exit(main(*(int(arg) for arg in args)))
@@ -0,0 +1,327 @@
+# ---- benchmarks/exam_day.py ----
+# Exam-day load test over HTTP. Seeds a loadgen.py dataset into a scratch
+# database, serves the Flask app from an in-process threaded WSGI server and
+# replays the day in phases: a login-wave dashboard burst, exam page loads,
+# autosaves with timer polls, then the end-of-exam submit storm. Reports
+# throughput and p50/p95/p99 latency per phase and route as JSON, so runs on
+# different commits can be compared (--baseline). Uses the configured mongod,
+# or an in-memory mongomock with --mongomock: a smoke run of the scenario
+# only, its timings say nothing and it is not thread-safe (expect the odd
+# error under concurrency).
+# The app has no login, so every virtual user is views.STUDENT_ID; users are
+# spread over exams the student has no result for yet, so submits are graded.
+# Each user keeps its own session cookie. With --admission-rate, --cohort
+# users open the same exam and "in line" (429) answers are retried after
+# Retry-After; for a start-time rush set --concurrency to the cohort size.
+# Pages whose templates the tree does not ship are rendered by a stub (see
+# render_with_stubs), and the exam_questions requests are left out when
+# there is no exam_questions.html fragment.
+# Run with: python -m benchmarks.exam_day [--users N] [--students N] [--mongomock] [--output FILE] [--baseline FILE]
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest import mock
+from urllib.parse import urlencode
+
+SCRATCH_DB = "EduAssessBench_examday"
+PHASES = ("login_wave", "exam_load", "autosave", "submit_storm")
+PERCENTILES = (50, 95, 99)
+OPTIONS = ["A", "B", "C", "D"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(args):
+    """Generate the dataset with loadgen.py (same seed, same data)."""
+    import loadgen
+    with contextlib.redirect_stdout(sys.stderr):     # stdout carries the JSON report
+        loadgen.main([
+            "--uri", args.uri, "--db", SCRATCH_DB, "--drop", "--seed", str(args.seed),
+            "--students", str(args.students), "--courses", str(args.courses), "--courses-per-student", "5",
+            "--semesters", "2", "--exams-per-course", str(args.exams_per_course), "--questions", str(args.questions),
+        ])
+
+
+def scenario_exams(db, student):
+    """Exams for the virtual users.
+
+    Still open (closed exams start no timer) and without a result for the
+    student (e.g. from a --no-seed rerun).
+    """
+    taken = set(db["exam_results"].distinct("exam", {"student": student}))
+    query = {"questions": {"$exists": True}, "end_at": {"$gt": datetime.now()}}
+    exams = [e for e in db["exams"].find(query, {"questions": 1}).sort("_id", 1) if e['_id'] not in taken]
+    if not exams:
+        sys.exit("No open exams in the dataset")
+    return exams
+
+
+def render_with_stubs(app):
+    """A stand-in for routes.render_template: site templates the app has, stubs for the rest.
+
+    The stub page is just the template name (and the score on a result
+    page). The questions fragment is never stubbed: without it the exam
+    page carries the questions itself, as it does in production.
+    """
+    from flask import render_template
+
+    from fragments import FRAGMENT_TEMPLATE
+
+    available = set(app.jinja_env.list_templates())
+
+    def render(template, **context):
+        if template in available or template == FRAGMENT_TEMPLATE:
+            return render_template(template, **context)
+        return f"{template} {context.get('score', '')}".strip()
+    return render, available
+
+
+def build_phases(exams, users, autosaves, cohort, rng, questions=True):
+    """(phase, [(user, route, method, path, body, content_type)]) in replay order.
+
+    Users open (and autosave) exams in cohorts of users per exam; submits
+    use one exam per user, so each is graded. questions=False leaves out
+    the question body requests (the site has no fragment template).
+    """
+    def opened(user):
+        return exams[user // cohort % len(exams)]
+
+    def exam_for(user):
+        return exams[user % len(exams)]
+
+    def fields(exam):
+        return [f"q{i}" for i in range(1, len(exam.get('questions') or []) + 1)] or ["q1"]
+
+    login = [(user, "dashboard", "GET", "/", None, None) for user in range(users)]
+    load = []
+    for user in range(users):
+        exam = opened(user)['_id']
+        load.append((user, "start_exam", "GET", f"/exam/{exam}", None, None))
+        if questions:
+            load.append((user, "exam_questions", "GET", f"/exam/{exam}/questions", None, None))
+
+    autosave = []
+    for _ in range(autosaves):
+        for user in range(users):
+            exam = opened(user)
+            change = {rng.choice(fields(exam)): rng.choice(OPTIONS)}
+            autosave.append((user, "autosave_exam", "POST", f"/exam/{exam['_id']}/autosave",
+                             json.dumps(change), "application/json"))
+            autosave.append((user, "exam_remaining", "GET", f"/exam/{exam['_id']}/remaining", None, None))
+
+    storm = []
+    for user in range(users):
+        exam = exam_for(user)
+        answers = {field: rng.choice(OPTIONS) for field in fields(exam)}
+        storm.append((user, "submit_exam", "POST", f"/exam/{exam['_id']}/submit",
+                      urlencode(answers), "application/x-www-form-urlencoded"))
+    return list(zip(PHASES, (login, load, autosave, storm)))
+
+
+def run_phase(port, requests, concurrency, cookies):
+    """Replay requests from concurrency keep-alive connections; returns (samples, seconds).
+
+    samples are (route, latency ms, ok) tuples; "in line" answers are
+    recorded as '<route> (queued)' and retried after their Retry-After.
+    cookies maps user -> session cookie, kept across phases.
+    """
+    local = threading.local()
+
+    def request(user, method, path, body, content_type):
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        headers = {"Content-Type": content_type} if content_type else {}
+        if user in cookies:
+            headers["Cookie"] = cookies[user]
+        try:
+            local.conn.request(method, path, body=body, headers=headers)
+            response = local.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            local.conn.close()
+            del local.conn
+            return None
+        if response.getheader("Set-Cookie"):
+            cookies[user] = response.getheader("Set-Cookie").split(";", 1)[0]
+        return response
+
+    def send(req):
+        user, route, method, path, body, content_type = req
+        samples = []
+        while True:
+            start = time.perf_counter()
+            response = request(user, method, path, body, content_type)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response is None or response.status != 429:
+                samples.append((route, elapsed, response is not None and response.status < 400))
+                return samples
+            samples.append((f"{route} (queued)", elapsed, True))
+            time.sleep(int(response.getheader("Retry-After") or 1))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = [sample for batch in pool.map(send, requests) for sample in batch]
+    return samples, time.perf_counter() - started
+
+
+def summarise(samples, seconds):
+    by_route = {}
+    for route, ms, ok in samples:
+        by_route.setdefault(route, []).append((ms, ok))
+    routes = {}
+    for route, rows in sorted(by_route.items()):
+        latencies = [ms for ms, _ in rows]
+        routes[route] = {
+            "count": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "rps": round(len(rows) / seconds, 1),
+            **{f"p{p}_ms": round(percentile(latencies, p), 2) for p in PERCENTILES},
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "max_ms": round(max(latencies), 2),
+        }
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "seconds": round(seconds, 3),
+        "rps": round(len(samples) / seconds, 1) if seconds else 0.0,
+        "routes": routes,
+    }
+
+
+def compare(report, baseline):
+    """Print p50/p95/p99 and throughput changes against a baseline report."""
+    print(f"\nvs {baseline.get('commit') or 'baseline'} ({baseline.get('started_at')})", file=sys.stderr)
+    for phase, summary in report['phases'].items():
+        for route, now in summary['routes'].items():
+            before = baseline.get('phases', {}).get(phase, {}).get('routes', {}).get(route)
+            if not before:
+                continue
+            changes = []
+            for key in [f"p{p}_ms" for p in PERCENTILES] + ["rps"]:
+                if before.get(key):
+                    changes.append(f"{key} {(now[key] - before[key]) / before[key] * 100:+6.1f}%")
+            print(f"  {phase:<13} {route:<22} " + "  ".join(changes), file=sys.stderr)
+
+
+def print_report(report):
+    print(f"{'phase':<13} {'route':<22} {'n':>6} {'err':>5} {'req/s':>8} "
+          + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES), file=sys.stderr)
+    for phase, summary in report['phases'].items():
+        for route, row in summary['routes'].items():
+            print(f"{phase:<13} {route:<22} {row['count']:>6} {row['errors']:>5} {row['rps']:>8.1f} "
+                  + " ".join(f"{row[f'p{p}_ms']:>9.2f}" for p in PERCENTILES), file=sys.stderr)
+
+
+def run(args):
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from extensions import mongo
+    from fragments import FRAGMENT_TEMPLATE
+    from views import STUDENT_ID
+
+    if not args.no_seed:
+        seed(args)
+    app = create_app({"MONGO_DB": SCRATCH_DB, "WRITE_BEHIND": args.write_behind,
+                      "ADMISSION_RATE": args.admission_rate, "ADMISSION_BURST": args.admission_burst})
+    exams = scenario_exams(mongo.db, STUDENT_ID)
+    render, templates = render_with_stubs(app)
+    phases = build_phases(exams, args.users, args.autosaves, args.cohort, random.Random(args.seed),
+                          questions=FRAGMENT_TEMPLATE in templates)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)     # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="exam-day-server", daemon=True)
+    thread.start()
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": "mongomock" if args.mongomock else "mongod",
+        "config": {key: getattr(args, key) for key in ("users", "concurrency", "autosaves", "cohort", "students",
+                                                       "courses", "exams_per_course", "questions", "seed",
+                                                       "write_behind", "admission_rate", "admission_burst")},
+        "exams": min(len(exams), args.users),
+        "site_templates": sorted(templates),
+        "phases": {},
+    }
+    cookies = {}
+    try:
+        with mock.patch("routes.render_template", render):
+            for phase, requests in phases:
+                samples, seconds = run_phase(server.server_port, requests, args.concurrency, cookies)
+                report['phases'][phase] = summarise(samples, seconds)
+    finally:
+        server.shutdown()
+    return report
+
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Replay an exam day against the app and report latency per route")
+    parser.add_argument("--users", type=int, default=200, help="virtual users")
+    parser.add_argument("--concurrency", type=int, default=50, help="client connections")
+    parser.add_argument("--autosaves", type=int, default=5, help="autosaves per user")
+    parser.add_argument("--cohort", type=int, default=1, help="users opening the same exam")
+    parser.add_argument("--admission-rate", type=float, default=0.0, help="ADMISSION_RATE, 0: off")
+    parser.add_argument("--admission-burst", type=int, default=50, help="ADMISSION_BURST")
+    parser.add_argument("--students", type=int, default=1000, help="dataset size (loadgen.py)")
+    parser.add_argument("--courses", type=int, default=40)
+    parser.add_argument("--exams-per-course", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--write-behind", action="store_true", help="submit through the write-behind journal")
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the dataset from the last run (mongod)")
+    parser.add_argument("--mongomock", action="store_true", help="in-memory database instead of mongod (smoke runs)")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare with")
+    args = parser.parse_args(argv)
+    if args.mongomock and args.no_seed:
+        parser.error("--no-seed needs the dataset of an earlier run on mongod")
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+        with mock.patch("extensions.MongoClient", return_value=client), \
+                mock.patch("loadgen.MongoClient", return_value=client):
+            report = run(args)
+    else:
+        report = run(args)
+
+    print_report(report)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            compare(report, json.load(baseline))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any(summary['errors'] for summary in report['phases'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# ---- benchmarks/gpa.py ----
+# GPA maintenance at cohort scale: incremental finalise (one $inc per result)
+# vs a full semester rebuild (one aggregation + batched writes), then the
+# consistency check. Uses a scratch database on the configured mongod, which
+# is dropped afterwards.
+# Run with: python -m benchmarks.gpa [students] [courses_per_semester] [finalise_sample]
+import random
+import sys
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, MongoClient
+
+from config import Config
+from gpa import FINALIZED, SemesterCalendar, check_semester, finalise_result, rebuild_semester
+
+SCRATCH_DB = "EduAssessBench_gpa"
+GRADES = [("A", 4.0), ("A-", 3.67), ("B+", 3.33), ("B", 3.0), ("C", 2.0), ("F", 0.0)]
+
+
+def load(db, n_students, n_courses, rng):
+    """Two semesters of course results; the second is left to be finalised."""
+    semesters = db["semesters"].insert_many([
+        {"semester_code": "2024/2025-1", "start_date": datetime(2024, 9, 1)},
+        {"semester_code": "2024/2025-2", "start_date": datetime(2025, 2, 1)},
+    ]).inserted_ids
+    courses = [ObjectId() for _ in range(n_courses * 4)]
+
+    batch = []
+    for _ in range(n_students):
+        student = ObjectId()
+        for semester, status in zip(semesters, (FINALIZED, "IN_PROGRESS")):
+            for course in rng.sample(courses, n_courses):
+                grade, point = rng.choice(GRADES)
+                batch.append({
+                    "student": student, "course": course, "academic_semester": semester,
+                    "final_grade": grade, "grade_point": point, "credit_hours": rng.choice((2, 3, 4)),
+                    "status": status,
+                })
+        if len(batch) >= 10000:
+            db["course_results"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db["course_results"].insert_many(batch, ordered=False)
+
+    db["course_results"].create_index([("academic_semester", ASCENDING), ("status", ASCENDING)])
+    db["student_semester_records"].create_index([("student", 1), ("academic_semester", 1)], unique=True)
+    return semesters
+
+
+def timed(label, fn, count, unit):
+    start = time.perf_counter()
+    value = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f} s   {count / elapsed:10,.0f} {unit}/s")
+    return value
+
+
+def main(n_students=50000, n_courses=5, n_finalise=5000):
+    client = MongoClient(Config.MONGO_URI)
+    client.drop_database(SCRATCH_DB)
+    db = client[SCRATCH_DB]
+    rng = random.Random(42)
+    try:
+        print(f"Loading {n_students:,} students x {n_courses} courses x 2 semesters...")
+        previous, current = load(db, n_students, n_courses, rng)
+        quiet = lambda message: None
+
+        timed("rebuild previous semester", lambda: rebuild_semester(db, previous, log=quiet), n_students, "students")
+
+        # Incremental: finalise a sample of current-semester results one by one
+        calendar = SemesterCalendar(db)
+        sample = [r['_id'] for r in db["course_results"].find({"academic_semester": current}, {"_id": 1}).limit(n_finalise)]
+        timed("incremental finalise", lambda: [finalise_result(db, oid, calendar=calendar) for oid in sample],
+              len(sample), "results")
+
+        # The rest of the semester in bulk
+        db["course_results"].update_many({"academic_semester": current}, {"$set": {"status": FINALIZED}})
+        timed("rebuild current semester", lambda: rebuild_semester(db, current, log=quiet), n_students, "students")
+
+        mismatches = timed("consistency check", lambda: check_semester(db, current), n_students, "students")
+        print(f"{len(mismatches)} mismatches")
+    finally:
+        client.drop_database(SCRATCH_DB)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,40 @@
+# ---- benchmarks/grade_bands.py ----
+# Grade-band assignment for a whole exam, without DB I/O: percentages from
+# result documents, then each grading mode, vs a per-result Python loop.
+# Run with: python -m benchmarks.grade_bands [results]
+import random
+import sys
+import time
+
+from grading_scheme import DEFAULT_BANDS, MODES, GradingScheme, result_percentages
+
+
+def legacy_grade(percentage):
+    """One result at a time, walking the bands from the top."""
+    for minimum, grade, point in DEFAULT_BANDS:
+        if percentage >= minimum:
+            return grade, point
+    return DEFAULT_BANDS[-1][1:]
+
+
+def timed(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms   {n / elapsed:12,.0f} results/s")
+
+
+def main(n_results=100000):
+    rng = random.Random(42)
+    results = [{"score": min(max(rng.gauss(32, 8), 0), 50), "total": 50} for _ in range(n_results)]
+    percentages = result_percentages(results)
+
+    timed("result_percentages", lambda: result_percentages(results), n_results)
+    timed("python loop (bands)", lambda: [legacy_grade(p) for p in percentages.tolist()], n_results)
+    for mode in MODES:
+        scheme = GradingScheme(mode=mode)
+        timed(f"vectorized ({mode})", lambda: scheme.assign(percentages), n_results)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,60 @@
+# ---- benchmarks/grading.py ----
+# Microbenchmark: compiled AnswerKey vs the per-question loop submit_exam used.
+# Run with: python -m benchmarks.grading [questions] [submissions]
+import random
+import sys
+import time
+
+from grading import AnswerKey
+
+
+def legacy_score(questions, form):
+    """The original submit_exam loop, kept here for comparison."""
+    score = 0
+    for idx, q in enumerate(questions, start=1):
+        submitted = form.get(f'q{idx}')
+        correct = q.get('answer')
+        if submitted is not None and str(submitted).strip() == str(correct).strip():
+            score += 1
+    return score
+
+
+def make_exam(n_questions, rng):
+    options = ["A", "B", "C", "D"]
+    return [
+        {"question_text": f"Q{i}", "options": options, "answer": rng.choice(options)}
+        for i in range(n_questions)
+    ]
+
+
+def make_submissions(questions, n_submissions, rng):
+    return [
+        {f"q{idx}": rng.choice(q["options"]) for idx, q in enumerate(questions, start=1)}
+        for _ in range(n_submissions)
+    ]
+
+
+def timed(label, fn, n, unit="submission"):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:8.1f} ms  {elapsed / n * 1e6:8.2f} µs/{unit}")
+    return result
+
+
+def main(n_questions=50, n_submissions=20000):
+    rng = random.Random(42)
+    questions = make_exam(n_questions, rng)
+    submissions = make_submissions(questions, n_submissions, rng)
+    print(f"{n_questions} questions x {n_submissions} submissions")
+
+    legacy = timed("legacy loop", lambda: [legacy_score(questions, f) for f in submissions], n_submissions)
+    key = timed("compile key", lambda: AnswerKey(questions), 1, unit="exam")
+    compiled = timed("AnswerKey.score", lambda: [key.score(f) for f in submissions], n_submissions)
+    matrix = timed("AnswerKey.correct_matrix", lambda: key.correct_matrix(submissions), n_submissions)
+    batch = (matrix @ key.marks_array).tolist()
+    assert legacy == compiled == batch, "compiled key disagrees with the legacy loop"
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,99 @@
+# ---- benchmarks/serving.py ----
+# Sync (Flask dev server, thread per connection) vs async (Quart on hypercorn):
+# requests/s on the dashboard and exam page, and server memory per idle
+# connection. Needs a seeded local mongod (python seed.py). Linux only (/proc).
+# Run with: python -m benchmarks.serving [requests] [concurrency] [idle_connections]
+import asyncio
+import subprocess
+import sys
+import time
+
+from pymongo import MongoClient
+
+from config import Config
+
+HOST = "127.0.0.1"
+SERVERS = {
+    "sync (flask)": ([sys.executable, "-m", "flask", "--app", "app", "run", "--port", "5101", "--with-threads"], 5101),
+    "async (asgi)": ([sys.executable, "-m", "hypercorn", "asgi:app", "--bind", f"{HOST}:5102"], 5102),
+}
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+async def throughput(port, paths, n_requests, concurrency):
+    """Requests/s for n_requests spread over concurrency workers."""
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        while not queue.empty():
+            await get(port, queue.get_nowait())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return n_requests / (time.perf_counter() - start)
+
+
+async def idle_connections(port, pid, count):
+    """Server memory (KiB) per open connection with a request still in flight."""
+    before = rss_kb(pid)
+    writers = []
+    for _ in range(count):
+        _, writer = await asyncio.open_connection(HOST, port)
+        # An unfinished request keeps the connection (and any worker) busy
+        writer.write(f"GET / HTTP/1.1\r\nHost: {HOST}\r\n".encode())
+        writers.append(writer)
+    await asyncio.sleep(2)
+    per_connection = (rss_kb(pid) - before) / count
+    for writer in writers:
+        writer.close()
+    return per_connection
+
+
+def wait_until_up(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            asyncio.run(get(port, "/cache/stats"))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def main(n_requests=2000, concurrency=50, n_idle=500):
+    exam = MongoClient(Config.MONGO_URI)[Config.MONGO_DB]["exams"].find_one({}, {"_id": 1})
+    if not exam:
+        sys.exit("No exams found, run seed.py first")
+    paths = ["/", f"/exam/{exam['_id']}"]
+
+    for label, (command, port) in SERVERS.items():
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(port)
+            rps = asyncio.run(throughput(port, paths, n_requests, concurrency))
+            per_conn = asyncio.run(idle_connections(port, server.pid, n_idle))
+            print(f"{label:<14} {rps:8.0f} req/s   {per_conn:7.1f} KiB/connection ({n_idle} idle)")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,92 @@
+# ---- benchmarks/submit_latency.py ----
+# Submit-storm load test: p50/p99 latency of /exam/<id>/submit with and without
+# write-behind. Needs a seeded database (python seed.py). The app has no
+# login, so each submit goes to its own scratch copy of a seeded exam: every
+# POST is a first submit that is graded and written, not a duplicate. The
+# copies and their results are deleted afterwards.
+# Run with: python -m benchmarks.submit_latency [submits] [concurrency]
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+
+from app import app
+from extensions import mongo
+from routes import get_exam, submission_writer
+from stats import STATS
+
+# Collections holding the scratch exams' data
+SCRATCH_COLLECTIONS = ("exam_results", "exam_submissions", "exam_timers", "exam_drafts")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def scratch_exams(exam, n):
+    """Insert n copies of exam under new ids, already in the exam cache."""
+    copies = [{**exam, "_id": ObjectId(), "title": f"{exam.get('title')} (submit benchmark)"} for _ in range(n)]
+    mongo.db["exams"].insert_many(copies)
+    with app.app_context():
+        for copy in copies:
+            get_exam(copy['_id'])
+    return [copy['_id'] for copy in copies]
+
+
+def drop_scratch(exam_ids):
+    mongo.db["exams"].delete_many({"_id": {"$in": exam_ids}})
+    mongo.db[STATS].delete_many({"_id": {"$in": exam_ids}})
+    for name in SCRATCH_COLLECTIONS:
+        mongo.db[name].delete_many({"exam": {"$in": exam_ids}})
+
+
+def storm(exam_ids, concurrency):
+    """One POST per exam from concurrency threads; returns latencies in ms."""
+    client = app.test_client()
+
+    def submit(i):
+        start = time.perf_counter()
+        client.post(f"/exam/{exam_ids[i]}/submit", data={"q1": "A", "q2": "True" if i % 2 else "False"})
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(submit, range(len(exam_ids))))
+
+
+def report(label, latencies):
+    print(f"{label:<14} n={len(latencies):<6} "
+          f"p50={percentile(latencies, 50):7.2f} ms  "
+          f"p99={percentile(latencies, 99):7.2f} ms  "
+          f"mean={statistics.mean(latencies):7.2f} ms")
+
+
+def main(n_submits=2000, concurrency=50):
+    exam = mongo.db["exams"].find_one({"questions.0": {"$exists": True}})
+    if not exam:
+        sys.exit("No exams found, run seed.py first")
+
+    exam_ids = scratch_exams(exam, 2 * n_submits)
+    try:
+        app.config['WRITE_BEHIND'] = False
+        report("synchronous", storm(exam_ids[:n_submits], concurrency))
+
+        app.config['WRITE_BEHIND'] = True
+        app.config['WRITE_BEHIND_JOURNAL'] = os.path.join(tempfile.mkdtemp(), "journal.sqlite3")
+        report("write-behind", storm(exam_ids[n_submits:], concurrency))
+
+        with app.app_context():
+            writer = submission_writer()
+        while writer.journal.backlog():
+            time.sleep(0.1)
+        print("write-behind journal drained")
+    finally:
+        drop_scratch(exam_ids)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,38 @@
+import os
+
+
+class Config:
+    """Default settings; create_app() takes overrides as a dict or object."""
+
+    SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey")
+
+    # MongoDB connection (see extensions.client_options)
+    MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+    MONGO_DB = os.environ.get("MONGO_DB", "EduAssessDB")
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_CONNECT_TIMEOUT_MS = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+    MONGO_SOCKET_TIMEOUT_MS = None          # no limit
+    MONGO_READ_PREFERENCE = "primary"
+    MONGO_MAX_STALENESS_SECONDS = 90        # secondary reads, see dal.py (minimum 90)
+    MONGO_WRITE_CONCERN = 1                 # 'w': 1, 'majority', ...
+    MONGO_JOURNAL = None                    # server default
+
+    # Write-behind submissions: journal locally, flush to MongoDB in batches
+    WRITE_BEHIND = False
+    WRITE_BEHIND_JOURNAL = "submissions_journal.sqlite3"
+
+    # Create missing registry indexes (indexes.py) when the app starts
+    MONGO_ENSURE_INDEXES = os.environ.get("MONGO_ENSURE_INDEXES", "0") == "1"
+
+    # Exam start admission (admission.py): candidates/s per exam and process, 0: off
+    ADMISSION_RATE = float(os.environ.get("ADMISSION_RATE", 0))
+    ADMISSION_BURST = int(os.environ.get("ADMISSION_BURST", 50))
+
+    # Request metrics on /metrics (metrics.py) and the slow-request log (0: off)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 500))
+
+    # Rendered question bodies (fragments.py): memory only, or also on disk
+    FRAGMENT_CACHE_DIR = os.environ.get("FRAGMENT_CACHE_DIR")
@@ -0,0 +1,89 @@
+# ---- dal.py ----
+# Data access for the exam routes, with per-operation read routing:
+# dashboards and listings may come from a secondary (bounded staleness);
+# exam definitions (the cached answer keys), submissions, drafts and result
+# reads stay on the primary, so grading never uses a lagging exam and a
+# student always sees their own writes.
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from listing import fetch_page, scope_filter, student_scope_pipeline
+from stats import STATS, ExamStats
+from submission_queue import submission_key
+
+# What a result page needs from exam_results
+RESULT_FIELDS = {"score": 1, "total": 1, "status": 1, "submitted_at": 1}
+
+
+def secondary_reads(config):
+    """Read preference for read-heavy, staleness-tolerant queries."""
+    return SecondaryPreferred(max_staleness=config["MONGO_MAX_STALENESS_SECONDS"])
+
+
+def first_write(collection, key, doc):
+    """Insert doc under its unique key unless one is stored; True if this call inserted it.
+
+    A single upsert with $setOnInsert: an existing document is left as it is.
+    """
+    try:
+        return collection.update_one(key, {"$setOnInsert": doc}, upsert=True).upserted_id is not None
+    except DuplicateKeyError:
+        # A concurrent upsert on the unique index got there first
+        return False
+
+
+class ExamStore:
+    """Collections the routes use, each bound to its read preference."""
+
+    def __init__(self, db, config):
+        secondary = secondary_reads(config)
+        primary = Primary()
+
+        # Listings: replicas are fine
+        self.exams = db.get_collection("exams", read_preference=secondary)
+        self.students = db.get_collection("students", read_preference=secondary)
+
+        # Exam definitions for the cache: a re-read after a change event or a
+        # version bump must see that change, so the primary
+        self.exam_definitions = db.get_collection("exams", read_preference=primary)
+
+        # Read-your-writes: always the primary
+        self.exam_results = db.get_collection("exam_results", read_preference=primary)
+        self.exam_submissions = db.get_collection("exam_submissions", read_preference=primary)
+        self.exam_drafts = db.get_collection("exam_drafts", read_preference=primary)
+        self.exam_stats = ExamStats(db.get_collection(STATS, read_preference=primary))
+
+    # -------------------------------------------------------------
+    # Secondary reads
+    # -------------------------------------------------------------
+    def student_scope(self, student_code):
+        """Exams filter for one student (see listing.student_scope)."""
+        return scope_filter(next(self.students.aggregate(student_scope_pipeline(student_code)), None))
+
+    def dashboard_page(self, status, now, cursor=None, scope=None):
+        return fetch_page(self.exams, status, now, cursor=cursor, scope=scope)
+
+    # -------------------------------------------------------------
+    # Primary reads and writes
+    # -------------------------------------------------------------
+    def record_submission(self, result, submission):
+        """Store a graded submission; returns (stored result, created).
+
+        The first writer of an (exam, student, attempt) wins: a duplicate
+        (double click, client retry) changes nothing and gets the stored
+        result back.
+        """
+        key = submission_key(result)
+        first_write(self.exam_submissions, key, submission)
+        if not first_write(self.exam_results, key, result):
+            return self.stored_result(**key), False
+        self.exam_stats.record([result])
+        return result, True
+
+    def stored_result(self, exam, student, attempt):
+        """The result of one attempt, or None."""
+        return self.exam_results.find_one({"exam": exam, "student": student, "attempt": attempt}, RESULT_FIELDS)
+
+    def latest_result(self, exam, student):
+        """The student's most recent result for an exam, or None."""
+        return self.exam_results.find_one({"exam": exam, "student": student}, RESULT_FIELDS, sort=[("_id", -1)])
@@ -0,0 +1,108 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from lru import LRU
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2.0   # seconds between autosave flushes
+LOCAL_SESSIONS = 10000  # sessions whose answers are also kept in memory
+
+
+class DraftBuffer:
+    """In-progress answers, coalesced in memory per (exam, student).
+
+    Autosaves only carry the fields that changed. Repeated saves of the same
+    session between flushes collapse into one entry, which is written as a
+    single $set on exam_drafts; all sessions pending at a flush go out in
+    one bulk_write. Every answer saved through this process is also kept in
+    memory until the session submits, for reads without a round trip.
+    """
+
+    def __init__(self, collection, interval=FLUSH_INTERVAL, local_sessions=LOCAL_SESSIONS):
+        self.collection = collection
+        self.interval = interval
+        self._pending = {}
+        self._local = LRU(local_sessions)    # (exam, student) -> answers
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def save(self, exam, student, changes):
+        """Record changed answers for a session; returns the number of fields."""
+        self._start()
+        with self._lock:
+            self._pending.setdefault((exam, student), {}).update(changes)
+            self._local.put((exam, student), {**(self._local.peek((exam, student)) or {}), **changes})
+        return len(changes)
+
+    def local(self, exam, student):
+        """The answers saved through this process, without a database read; {} if none.
+
+        Saves that went to other worker processes are not included.
+        """
+        return dict(self._local.peek((exam, student)) or {})
+
+    def forget(self, exam, student):
+        """Drop the in-memory copy of a session that has been submitted."""
+        self._local.pop((exam, student))
+
+    def load(self, exam, student):
+        """Return the session's saved answers (pending included), or None."""
+        self.flush(exam, student)
+        draft = self.collection.find_one({"exam": exam, "student": student}, {"answers": 1})
+        return draft.get('answers', {}) if draft else None
+
+    def flush(self, exam=None, student=None):
+        """Write pending changes for one session, or for all sessions."""
+        with self._lock:
+            if exam is None:
+                pending, self._pending = self._pending, {}
+            else:
+                changes = self._pending.pop((exam, student), None)
+                pending = {(exam, student): changes} if changes else {}
+        if not pending:
+            return 0
+
+        now = datetime.now()
+        ops = [
+            UpdateOne(
+                {"exam": exam, "student": student},
+                {"$set": {**{f"answers.{field}": value for field, value in changes.items()}, "updated_at": now}},
+                upsert=True
+            )
+            for (exam, student), changes in pending.items()
+        ]
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except PyMongoError:
+            # Put the changes back (newer saves win) and retry on the next flush
+            with self._lock:
+                for session, changes in pending.items():
+                    self._pending[session] = {**changes, **self._pending.get(session, {})}
+            raise
+        return len(ops)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="draft-flush", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except PyMongoError as exc:
+                log.warning("Autosave flush failed, will retry: %s", exc)
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2      # seconds, when change streams are unavailable
+KEEPALIVE = 15         # seconds between SSE comments on idle streams
+QUEUE_SIZE = 100       # events buffered per client before dropping
+RESTART_DELAY = 5      # seconds before a failed watcher starts again
+
+# Collections that produce live events, and where each keeps the exam id
+SOURCES = {
+    "pause_exams": "exam_student.exam",
+    "exam_chats": "exam",
+    "time_extensions": "exam",
+}
+
+
+def to_event(collection, doc):
+    """Translate a pause/chat/extension document into a client event."""
+    if collection == "pause_exams":
+        resumed = doc.get('resume_timestamp')
+        return {
+            "type": "resume" if resumed else "pause",
+            "student": doc.get('exam_student', {}).get('student'),
+            "reason": doc.get('reason'),
+            "at": resumed or doc.get('pause_timestamp'),
+        }
+    if collection == "exam_chats":
+        return {
+            "type": "chat",
+            "student": doc.get('student'),
+            "content": doc.get('content'),
+            "at": doc.get('timestamp'),
+        }
+    return {
+        "type": "extension",
+        "student": doc.get('student'),
+        "minutes": doc.get('minutes'),
+        "at": doc.get('timestamp'),
+    }
+
+
+def format_sse(event):
+    """Encode an event as a Server-Sent Events message."""
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# -------------------------------------------------------------
+# Subscribers: one per open stream
+# -------------------------------------------------------------
+class QueueSubscriber:
+    """A thread-served stream (Flask): events land in a queue.Queue."""
+
+    def __init__(self, student):
+        self.student = student
+        self.queue = queue.Queue(QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass  # a stalled client must not hold up the others
+
+
+class AsyncSubscriber:
+    """An asyncio-served stream (asgi.py): events land in an asyncio.Queue.
+
+    Costs a queue and a suspended coroutine per connection, no thread.
+    """
+
+    def __init__(self, student, loop):
+        self.student = student
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+
+# -------------------------------------------------------------
+# Fan-out
+# -------------------------------------------------------------
+class ExamEventHub:
+    """Fans pause/resume, chat and extension events out to open streams.
+
+    Each exam with at least one subscriber has exactly one watcher (a change
+    stream, or a poll where change streams are unavailable), however many
+    clients are connected. Events addressed to a student only reach that
+    student's streams; events without a student reach everyone.
+    """
+
+    def __init__(self, db, poll_interval=POLL_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self._subscribers = {}
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, exam, subscriber):
+        with self._lock:
+            self._subscribers.setdefault(exam, set()).add(subscriber)
+            if exam not in self._watchers:
+                watcher = ExamWatcher(self, exam)
+                self._watchers[exam] = watcher
+                watcher.start()
+        return subscriber
+
+    def unsubscribe(self, exam, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(exam, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(exam, None)
+                watcher = self._watchers.pop(exam, None)
+                if watcher:
+                    watcher.stop()
+
+    def publish(self, exam, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(exam, ()))
+        for subscriber in subscribers:
+            if event.get('student') in (None, subscriber.student):
+                subscriber.put(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "exams": len(self._watchers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+
+class ExamWatcher(threading.Thread):
+    """The single source of live events for one exam."""
+
+    def __init__(self, hub, exam):
+        super().__init__(name=f"exam-events-{exam}", daemon=True)
+        self.hub = hub
+        self.exam = exam
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        # Subscribers rely on this thread for the exam's lifetime: never let it die
+        while not self._stopped.is_set():
+            try:
+                return self._follow()
+            except Exception:
+                log.exception("Event watcher for exam %s failed, restarting", self.exam)
+                self._stopped.wait(RESTART_DELAY)
+
+    def _follow(self):
+        if hasattr(type(self.hub.db), "watch"):
+            try:
+                return self._watch()
+            except PyMongoError as exc:
+                # Standalone servers have no change streams
+                log.info("Change streams unavailable for exam %s, polling: %s", self.exam, exc)
+        self._poll()
+
+    def _watch(self):
+        match = {
+            "operationType": {"$in": ["insert", "update", "replace"]},
+            "$or": [
+                {"ns.coll": coll, f"fullDocument.{field}": self.exam}
+                for coll, field in SOURCES.items()
+            ],
+        }
+        with self.hub.db.watch([{"$match": match}], full_document="updateLookup", max_await_time_ms=1000) as stream:
+            while not self._stopped.is_set():
+                change = stream.try_next()
+                # fullDocument is None when the document was deleted before the lookup
+                if change is not None and change.get('fullDocument') is not None:
+                    coll = change['ns']['coll']
+                    self.hub.publish(self.exam, to_event(coll, change['fullDocument']))
+
+    def _poll(self):
+        # Only what happens from now on; _id order follows insertion time
+        since = datetime.now()
+        last_ids = {coll: ObjectId.from_datetime(datetime.now(timezone.utc)) for coll in SOURCES}
+
+        while not self._stopped.wait(self.hub.poll_interval):
+            checked_at = datetime.now()
+            for coll, field in SOURCES.items():
+                query = {field: self.exam, "_id": {"$gt": last_ids[coll]}}
+                if coll == "pause_exams":
+                    # Resumes update an existing pause
+                    query = {field: self.exam, "$or": [
+                        {"_id": {"$gt": last_ids[coll]}},
+                        {"resume_timestamp": {"$gte": since}},
+                    ]}
+                try:
+                    docs = list(self.hub.db[coll].find(query).sort("_id", 1))
+                except PyMongoError as exc:
+                    log.warning("Event poll failed for exam %s: %s", self.exam, exc)
+                    continue
+                for doc in docs:
+                    last_ids[coll] = max(last_ids[coll], doc['_id'])
+                    self.hub.publish(self.exam, to_event(coll, doc))
+            since = checked_at
@@ -0,0 +1,107 @@
+# ---- exam_api.py ----
+# Exam content for thin clients: the question snapshot of an exam version as
+# compact JSON or MessagePack, encoded once per version and served with its
+# content hash as the ETag, so a reload costs a 304 and a small state call
+# instead of a full page render. Answers, model answers and rubrics never
+# leave the server. MessagePack needs msgpack (optional dependency).
+import hashlib
+import json
+
+from grading import field_names
+from lru import LRU
+from schedule import exam_duration
+
+CONTENT_CACHE_SIZE = 256     # exam versions kept in memory
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+FORMATS = (JSON, MSGPACK)
+
+# Optional per-question keys passed through to the client
+QUESTION_EXTRAS = ("section", "type")
+
+
+def exam_content(definition):
+    """The client's snapshot of an exam version: metadata and questions, no answers.
+
+    Question ids are the published question-bank ids where there are any,
+    else the form field, so they stay the same across versions.
+    """
+    doc = definition.doc
+    questions = []
+    for field, q in zip(field_names(len(definition.questions)), definition.questions):
+        item = {
+            "id": str(q.get('question') or field),
+            "field": field,
+            "text": q['question_text'],
+            "options": q['options'],
+            "marks": q['marks'],
+        }
+        item.update({key: q[key] for key in QUESTION_EXTRAS if q.get(key) is not None})
+        questions.append(item)
+    return {
+        "exam": str(doc['_id']),
+        "title": doc.get('title') or doc.get('name'),
+        "version": definition.version,
+        "start_at": definition.start_at.isoformat() if definition.start_at else None,
+        "end_at": definition.end_at.isoformat() if definition.end_at else None,
+        "duration_minutes": exam_duration(doc),
+        "total_marks": definition.answer_key.total,
+        "questions": questions,
+    }
+
+
+def content_hash(content):
+    """Hash of the canonical JSON form: the same whichever format is served."""
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def encode(payload, mimetype):
+    """Compact JSON or MessagePack bytes."""
+    if mimetype == MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError("MessagePack responses need msgpack (pip install msgpack)") from None
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+class ExamContent:
+    """One exam version's content, its hash and its encodings by mimetype."""
+
+    def __init__(self, content):
+        self.hash = content_hash(content)
+        self.payload = {**content, "hash": self.hash}
+        self.bodies = {}
+
+    def body(self, mimetype):
+        body = self.bodies.get(mimetype)
+        if body is None:
+            body = self.bodies[mimetype] = encode(self.payload, mimetype)
+        return body
+
+    def etag(self, mimetype):
+        return f"{self.hash}-{FORMATS.index(mimetype)}"
+
+
+class ContentCache:
+    """ExamContent per (exam id, version), encoded on first request only.
+
+    Keyed like FragmentCache: content built for one version is never
+    served for another.
+    """
+
+    def __init__(self, maxsize=CONTENT_CACHE_SIZE):
+        self._entries = LRU(maxsize)
+
+    def get(self, definition):
+        key = (str(definition.doc['_id']), definition.version)
+        content = self._entries.get(key)
+        if content is None:
+            content = ExamContent(exam_content(definition))
+            self._entries.put(key, content)
+        return content
+
+    def stats(self):
+        return self._entries.stats()
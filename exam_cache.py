@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+
+from pymongo.errors import PyMongoError
+
+from grading import AnswerKey
+from lru import LRU
+from schedule import exam_window
+
+log = logging.getLogger(__name__)
+
+CACHE_SIZE = 256      # exams kept in memory
+CACHE_TTL = 30        # seconds before an entry is revalidated against 'version'
+
+# Dummy questions if none in DB (replace with real questions)
+DEFAULT_QUESTIONS = [
+    {"question_text": "Sample Q1", "options": ["A", "B", "C"], "answer": "A"},
+    {"question_text": "Sample Q2", "options": ["True", "False"], "answer": "True"}
+]
+
+
+def normalise_questions(exam):
+    """Return the exam's questions with the keys the routes rely on."""
+    questions = []
+    for q in exam.get('questions') or DEFAULT_QUESTIONS:
+        questions.append({
+            **q,
+            "question_text": q.get('question_text', q.get('question')),
+            "options": q.get('options', []),
+            "answer": q.get('answer'),
+            "marks": q.get('marks', 1),
+        })
+    return questions
+
+
+class ExamDefinition:
+    """A parsed exam: the document, start/end datetimes, questions and answer key.
+
+    Shared between requests, so callers must copy before mutating.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.version = doc.get('version', 0)
+        self.start_at, self.end_at = exam_window(doc)
+        self.questions = normalise_questions(doc)
+        self.answer_key = AnswerKey(self.questions)
+        self.expires = 0
+
+
+class ExamCache:
+    """Bounded LRU cache of ExamDefinition objects keyed by exam _id.
+
+    Entries are revalidated against the exam's 'version' field once their TTL
+    runs out; bump_version() invalidates immediately. When watch() has a
+    change stream open, entries stay valid until the stream invalidates them.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self.revalidations = 0
+        self.watching = False
+        self._entries = LRU(maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, collection, oid):
+        """Return the ExamDefinition for oid, or None if the exam does not exist."""
+        now = time.monotonic()
+        entry, fresh = self._lookup(oid, now)
+        if fresh:
+            return entry
+        if entry is not None:
+            # TTL ran out: a projected read of 'version' is enough to keep it
+            current = collection.find_one({"_id": oid}, {"version": 1})
+            if self._revalidate(entry, current, now):
+                return entry
+        return self._store(oid, collection.find_one({"_id": oid}), now)
+
+    async def aget(self, collection, oid):
+        """get() for async collections (pymongo's AsyncMongoClient)."""
+        now = time.monotonic()
+        entry, fresh = self._lookup(oid, now)
+        if fresh:
+            return entry
+        if entry is not None:
+            current = await collection.find_one({"_id": oid}, {"version": 1})
+            if self._revalidate(entry, current, now):
+                return entry
+        return self._store(oid, await collection.find_one({"_id": oid}), now)
+
+    def _lookup(self, oid, now):
+        """Return (entry, fresh) for oid; entry is None when not cached."""
+        entry = self._entries.peek(oid)
+        if entry is not None and (self.watching or entry.expires > now):
+            self._entries.count(hit=True)
+            return entry, True
+        return entry, False
+
+    def _revalidate(self, entry, current, now):
+        if current is None or current.get('version', 0) != entry.version:
+            return False
+        with self._lock:
+            entry.expires = now + self.ttl
+            self.revalidations += 1
+        self._entries.count(hit=True)
+        return True
+
+    def _store(self, oid, doc, now):
+        self._entries.count(hit=False)
+        if doc is None:
+            self._entries.pop(oid)
+            return None
+        entry = ExamDefinition(doc)
+        entry.expires = now + self.ttl
+        self._entries.put(oid, entry)
+        return entry
+
+    def invalidate(self, oid=None):
+        """Drop one exam, or every exam when oid is None."""
+        if oid is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(oid)
+
+    def bump_version(self, collection, oid, update=None):
+        """Apply an edit to an exam, bump its 'version' and invalidate it."""
+        update = dict(update or {})
+        update["$inc"] = {**update.get("$inc", {}), "version": 1}
+        result = collection.update_one({"_id": oid}, update)
+        self.invalidate(oid)
+        return result
+
+    def stats(self):
+        entries = self._entries.stats()
+        with self._lock:
+            return {
+                "hits": entries['hits'],
+                "misses": entries['misses'],
+                "revalidations": self.revalidations,
+                "size": entries['size'],
+                "watching": self.watching,
+            }
+
+    # -------------------------------------------------------------
+    # Change stream invalidation (replica sets only)
+    # -------------------------------------------------------------
+    def watch(self, collection):
+        """Invalidate entries from a change stream in a background thread.
+
+        Standalone servers don't support change streams; the cache then keeps
+        relying on the TTL + 'version' check.
+        """
+        if not hasattr(type(collection), "watch"):
+            # e.g. mongomock collections
+            log.info("Exam cache change stream unsupported by %s", type(collection).__name__)
+            return None
+        thread = threading.Thread(target=self._watch, args=(collection,), daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self, collection):
+        try:
+            with collection.watch() as stream:
+                self.watching = True
+                # Anything cached before the stream opened may be stale
+                self.invalidate()
+                for change in stream:
+                    key = change.get("documentKey", {}).get("_id")
+                    self.invalidate(key)
+        except PyMongoError as exc:
+            log.info("Exam cache change stream unavailable, using version checks: %s", exc)
+        finally:
+            self.watching = False
@@ -0,0 +1,178 @@
+# ---- export.py ----
+# Streaming semester exports of course_results, exam_results and
+# student_semester_records. Rows come off a batched, projected cursor and go
+# straight out as CSV chunks or Parquet row groups, so memory stays flat
+# whatever the cohort size. Parquet needs pyarrow (optional dependency).
+# Run with: python export.py <kind> <semester> [--format csv|parquet] [--output PATH]
+import argparse
+import csv
+import io
+import sys
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+BATCH_SIZE = 5000      # cursor batch, CSV chunk and Parquet row group size
+
+# kind -> (collection, [(column, type)]); type is string, float or timestamp
+EXPORTS = {
+    "course_results": ("course_results", [
+        ("_id", "string"), ("student", "string"), ("course", "string"), ("academic_semester", "string"),
+        ("final_grade", "string"), ("final_percentage", "float"), ("grade_point", "float"),
+        ("credit_hours", "float"), ("status", "string"), ("entered_at", "timestamp"),
+    ]),
+    "exam_results": ("exam_results", [
+        ("_id", "string"), ("exam", "string"), ("student", "string"), ("attempt", "float"),
+        ("score", "float"), ("total", "float"), ("marks", "float"), ("grade", "string"),
+        ("status", "string"), ("submitted_at", "timestamp"), ("recorded_date", "timestamp"),
+    ]),
+    "student_semester_records": ("student_semester_records", [
+        ("_id", "string"), ("student", "string"), ("academic_semester", "string"),
+        ("semester_gpa", "float"), ("semester_credits", "float"), ("semester_grade_points", "float"),
+        ("cumulative_gpa", "float"), ("total_credits", "float"), ("total_grade_points", "float"),
+        ("status", "string"), ("finalized_date", "timestamp"),
+    ]),
+}
+
+
+def semester_keys(db, semester):
+    """Values academic_semester may hold for a semester: its _id and its code."""
+    query = {"semester_code": semester}
+    if ObjectId.is_valid(semester):
+        query = {"$or": [{"_id": ObjectId(semester)}, query]}
+    found = db["semesters"].find_one(query, {"semester_code": 1})
+    if not found:
+        raise ValueError(f"Semester not found: {semester}")
+    return [found['_id'], found.get('semester_code')]
+
+
+def export_query(db, kind, semester):
+    """Filter for one semester's documents of an export kind."""
+    keys = semester_keys(db, semester)
+    if kind == "exam_results":
+        # Results carry the exam only; exams carry the semester
+        exams = [e['_id'] for e in db["exams"].find({"academic_semester": {"$in": keys}}, {"_id": 1})]
+        return {"exam": {"$in": exams}}
+    return {"academic_semester": {"$in": keys}}
+
+
+def iter_rows(db, kind, semester, batch_size=BATCH_SIZE):
+    """Yield one semester's documents, projected to the export's columns."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export: {kind}")
+    collection, columns = EXPORTS[kind]
+    projection = {name: 1 for name, _ in columns}
+    cursor = db[collection].find(export_query(db, kind, semester), projection).sort("_id", 1)
+    return cursor.batch_size(batch_size)
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(rows, columns, chunk_rows=BATCH_SIZE):
+    """Yield CSV text (header first) in chunks of up to chunk_rows rows."""
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    count = 0
+    for row in rows:
+        writer.writerow([csv_value(row.get(name)) for name in names])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class RowCounter:
+    """Iterate rows while counting them, for rows/s reporting."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+    def rate(self):
+        return self.count / max(time.perf_counter() - self.started, 1e-9)
+
+
+def write_csv(rows, columns, out):
+    """Write rows to a text stream; returns the number of rows."""
+    counter = RowCounter(rows)
+    for chunk in csv_chunks(counter, columns):
+        out.write(chunk)
+    return counter.count
+
+
+def write_parquet(rows, columns, path, row_group_size=BATCH_SIZE):
+    """Write rows to a Parquet file, one row group per batch; returns the number of rows."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+
+    types = {"string": pa.string(), "float": pa.float64(), "timestamp": pa.timestamp("ms")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    names = [name for name, _ in columns]
+
+    def convert(row):
+        return {name: str(row[name]) if isinstance(row.get(name), ObjectId) else row.get(name) for name in names}
+
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(convert(row))
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export a semester's results")
+    parser.add_argument("kind", choices=sorted(EXPORTS))
+    parser.add_argument("semester", help="semester _id or semester_code")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--output", help="file to write (default: stdout for CSV)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    columns = EXPORTS[args.kind][1]
+    rows = iter_rows(mongo.db, args.kind, args.semester, args.batch_size)
+    started = time.perf_counter()
+    if args.format == "parquet":
+        if not args.output:
+            parser.error("--output is required for Parquet")
+        count = write_parquet(rows, columns, args.output, args.batch_size)
+    else:
+        out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+        try:
+            count = write_csv(rows, columns, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    rate = count / max(time.perf_counter() - started, 1e-9)
+    print(f"✅ Exported {count} {args.kind} rows ({rate:,.0f} rows/s)", file=sys.stderr)
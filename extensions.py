@@ -0,0 +1,87 @@
+import os
+import threading
+
+from flask import current_app, has_app_context
+from pymongo import MongoClient
+
+
+def client_options(config):
+    """MongoClient keyword arguments from MONGO_* settings."""
+    options = {
+        "maxPoolSize": config["MONGO_MAX_POOL_SIZE"],
+        "minPoolSize": config["MONGO_MIN_POOL_SIZE"],
+        "connectTimeoutMS": config["MONGO_CONNECT_TIMEOUT_MS"],
+        "serverSelectionTimeoutMS": config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        "socketTimeoutMS": config["MONGO_SOCKET_TIMEOUT_MS"],
+        "readPreference": config["MONGO_READ_PREFERENCE"],
+        "w": config["MONGO_WRITE_CONCERN"],
+    }
+    if config["MONGO_JOURNAL"] is not None:
+        options["journal"] = config["MONGO_JOURNAL"]
+    if config.get("METRICS_ENABLED"):
+        from metrics import command_timer
+        options["event_listeners"] = [command_timer]
+    return options
+
+
+class AppMongo:
+    """One app's lazily created MongoClient (and pool), one per process.
+
+    Nothing connects until the first query, so importing or creating the app
+    never blocks on the database. A client inherited across fork() (e.g.
+    gunicorn preload) is discarded and rebuilt in the child.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = MongoClient(self.config["MONGO_URI"], connect=False, **client_options(self.config))
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.config["MONGO_DB"]]
+
+
+class Mongo:
+    """The current app's AppMongo, kept in app.extensions['mongo'].
+
+    Each app gets its own client built from its own config. Outside an app
+    context (command-line tools) the app initialised last is used.
+    """
+
+    def __init__(self, app=None):
+        self._last = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._last = app.extensions['mongo'] = AppMongo(app.config)
+        return self._last
+
+    def _state(self):
+        if has_app_context():
+            return current_app.extensions['mongo']
+        if self._last is None:
+            raise RuntimeError("No app: call create_app() first")
+        return self._last
+
+    @property
+    def client(self):
+        return self._state().client
+
+    @property
+    def db(self):
+        return self._state().db
+
+
+mongo = Mongo()
@@ -0,0 +1,143 @@
+# ---- fragments.py ----
+# Pre-rendered question bodies for start_exam. The questions are the same for
+# every candidate of an exam version, so they are rendered once and reused;
+# only the per-student parts (timer, saved answers) are rendered per request.
+# exam_questions.html goes with a start_exam.html that renders questions_html
+# (the page then gets no exam.questions); sites without it keep the full
+# render of the questions in start_exam.html.
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from markupsafe import Markup
+
+from lru import LRU
+
+log = logging.getLogger(__name__)
+
+FRAGMENT_TEMPLATE = "exam_questions.html"
+FRAGMENT_CACHE_SIZE = 256     # fragments kept in memory
+
+
+class Fragment:
+    """One rendered question body with its HTTP validators."""
+
+    def __init__(self, html, last_modified, render_seconds=0.0):
+        self.html = Markup(html)
+        self.etag = hashlib.sha1(str(html).encode()).hexdigest()
+        self.last_modified = last_modified
+        self.render_seconds = render_seconds
+
+
+class FragmentCache:
+    """Rendered question bodies keyed by (exam id, version).
+
+    Kept in a bounded LRU in memory and, when directory is set, on disk as
+    well so that other workers and restarts skip the render too. A new exam
+    version is a new key, so edits never serve a stale body.
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE, directory=None):
+        self.directory = directory
+        self.disk_hits = 0
+        self.render_seconds = 0.0
+        self._entries = LRU(maxsize)
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, definition, render):
+        """Return the Fragment for definition, calling render() only on a miss."""
+        key = self._key(definition)
+        fragment = self._lookup(key)
+        if fragment is None:
+            start = time.perf_counter()
+            fragment = self._store(key, definition, render(), time.perf_counter() - start)
+        return fragment
+
+    async def aget(self, definition, render):
+        """get() for async renderers (Quart's render_template)."""
+        key = self._key(definition)
+        fragment = self._lookup(key)
+        if fragment is None:
+            start = time.perf_counter()
+            fragment = self._store(key, definition, await render(), time.perf_counter() - start)
+        return fragment
+
+    def _key(self, definition):
+        return str(definition.doc['_id']), definition.version
+
+    def _lookup(self, key):
+        """Return the cached Fragment from memory or disk, or None."""
+        fragment = self._entries.peek(key)
+        if fragment is not None:
+            self._entries.count(hit=True)
+            return fragment
+
+        fragment = self._load(key)
+        if fragment is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._entries.put(key, fragment)
+        return fragment
+
+    def _store(self, key, definition, html, elapsed):
+        modified = definition.doc.get('last_modification_time') or datetime.now()
+        fragment = Fragment(html, modified.replace(microsecond=0), elapsed)
+        self._save(key, fragment)
+        self._entries.count(hit=False)
+        with self._lock:
+            self.render_seconds += elapsed
+        self._entries.put(key, fragment)
+        return fragment
+
+    def stats(self):
+        """Counters, with the render time saved by hits (mean render x hits)."""
+        entries = self._entries.stats()
+        with self._lock:
+            mean = self.render_seconds / entries['misses'] if entries['misses'] else 0.0
+            return {
+                "hits": entries['hits'],
+                "disk_hits": self.disk_hits,
+                "misses": entries['misses'],
+                "size": entries['size'],
+                "mean_render_ms": round(mean * 1000, 3),
+                "saved_render_ms": round(mean * (entries['hits'] + self.disk_hits) * 1000, 3),
+            }
+
+    # -------------------------------------------------------------
+    # Disk copies (optional)
+    # -------------------------------------------------------------
+    def _path(self, key):
+        exam_id, version = key
+        return os.path.join(self.directory, f"{exam_id}-{version}.html")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            modified = datetime.fromtimestamp(int(os.path.getmtime(path)))
+        except OSError:
+            return None
+        return Fragment(html, modified)
+
+    def _save(self, key, fragment):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(str(fragment.html))
+            # Readers see either no file or the whole fragment
+            os.replace(tmp, path)
+            stamp = fragment.last_modified.timestamp()
+            os.utime(path, (stamp, stamp))
+        except OSError as exc:
+            log.warning("Could not write fragment %s: %s", path, exc)
@@ -0,0 +1,303 @@
+# ---- gpa.py ----
+# Semester and cumulative GPA in student_semester_records, kept up to date from
+# course_results: incrementally as each result is finalised, or rebuilt for a
+# whole semester with one aggregation.
+# Run with: python gpa.py finalise <course_result_id>
+#           python gpa.py rebuild <semester_id> [--batch-size N]
+#           python gpa.py check <semester_id>
+import argparse
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from regrade import batched
+
+FINALIZED = "FINALIZED"
+IN_PROGRESS = "IN_PROGRESS"
+BATCH_SIZE = 1000
+GPA_DIGITS = 2
+
+TOTALS = ("semester_credits", "semester_grade_points", "total_credits", "total_grade_points")
+
+
+def gpa(grade_points, credits):
+    return round(grade_points / credits, GPA_DIGITS) if credits else 0.0
+
+
+class SemesterCalendar:
+    """Semester start dates, to order a student's semester records."""
+
+    def __init__(self, db):
+        self.semesters = db["semesters"]
+        self._starts = None
+
+    def start(self, semester):
+        if self._starts is None:
+            self._starts = {s['_id']: s['start_date'] for s in self.semesters.find({}, {"start_date": 1})}
+        if semester not in self._starts:
+            raise ValueError(f"Semester not found: {semester}")
+        return self._starts[semester]
+
+    def before(self, semester):
+        start = self.start(semester)
+        return [s for s, s_start in self._starts.items() if s_start < start]
+
+    def after(self, semester):
+        start = self.start(semester)
+        return [s for s, s_start in self._starts.items() if s_start > start]
+
+
+# -------------------------------------------------------------
+# Incremental: one finalised course result
+# -------------------------------------------------------------
+def finalise_result(db, result_id, user=None, calendar=None):
+    """Finalise a course result and add it to the student's GPA totals.
+
+    The totals move by an $inc, so the cost does not depend on the length of
+    the transcript. Each record lists the results in its totals
+    ('applied_results') and an $inc only applies to records that lack the
+    result, so the totals are moved first and the result is flagged
+    'gpa_applied' last: a finalise interrupted in between is simply run
+    again. Returns the result, or None if it was already applied or has no
+    grade point.
+    """
+    now = datetime.now()
+    result = db["course_results"].find_one(
+        {"_id": result_id, "grade_point": {"$ne": None}, "gpa_applied": {"$ne": True}}
+    )
+    if result is None:
+        return None
+
+    calendar = calendar or SemesterCalendar(db)
+    records = db["student_semester_records"]
+    student, semester = result['student'], result['academic_semester']
+    credits = result.get('credit_hours') or 0
+    points = result['grade_point'] * credits
+
+    ensure_record(records, calendar, student, semester, now)
+    records.update_one(
+        {"student": student, "academic_semester": semester, "applied_results": {"$ne": result_id}},
+        {"$inc": {"semester_credits": credits, "semester_grade_points": points,
+                  "total_credits": credits, "total_grade_points": points},
+         "$push": {"course_grades": course_grade(result), "applied_results": result_id},
+         "$set": {"last_modification_time": now, "last_modification_user_id": user}}
+    )
+    # Cumulative totals of any later semester include this result too
+    later = calendar.after(semester)
+    if later:
+        records.update_many(
+            {"student": student, "academic_semester": {"$in": later}, "applied_results": {"$ne": result_id}},
+            {"$inc": {"total_credits": credits, "total_grade_points": points},
+             "$push": {"applied_results": result_id}}
+        )
+
+    for record in records.find({"student": student, "academic_semester": {"$in": [semester, *later]}},
+                              dict.fromkeys(TOTALS, 1)):
+        refresh_gpa(records, record)
+
+    # Last, once the totals hold the result
+    return db["course_results"].find_one_and_update(
+        {"_id": result_id, "gpa_applied": {"$ne": True}},
+        {"$set": {"status": FINALIZED, "gpa_applied": True,
+                  "last_modification_time": now, "last_modification_user_id": user}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def course_grade(result):
+    return {
+        "course": result['course'],
+        "credits": result.get('credit_hours') or 0,
+        "grade": result.get('final_grade'),
+        "grade_point": result['grade_point'],
+    }
+
+
+def ensure_record(records, calendar, student, semester, now):
+    """Create the student's record for a semester, carrying the previous cumulative totals
+    (and the results they hold)."""
+    if records.find_one({"student": student, "academic_semester": semester}, {"_id": 1}):
+        return
+
+    previous = records.find(
+        {"student": student, "academic_semester": {"$in": calendar.before(semester)}},
+        {"academic_semester": 1, "total_credits": 1, "total_grade_points": 1, "applied_results": 1}
+    )
+    previous = max(previous, key=lambda r: calendar.start(r['academic_semester']), default={})
+    total_credits = previous.get('total_credits', 0)
+    total_points = previous.get('total_grade_points', 0.0)
+    try:
+        records.update_one(
+            {"student": student, "academic_semester": semester},
+            {"$setOnInsert": {
+                "semester_gpa": 0.0, "semester_credits": 0, "semester_grade_points": 0.0,
+                "cumulative_gpa": gpa(total_points, total_credits),
+                "total_credits": total_credits, "total_grade_points": total_points,
+                "course_grades": [], "applied_results": previous.get('applied_results', []), "status": IN_PROGRESS,
+                "creation_time": now, "is_active": True, "is_deleted": False,
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # created concurrently
+
+
+def refresh_gpa(records, record):
+    """Set semester_gpa/cumulative_gpa from the totals just read.
+
+    Compare-and-set on the totals: if another finalise moved them since, that
+    writer sets the GPA from the newer totals instead.
+    """
+    return records.update_one(
+        {"_id": record['_id'], **{field: record.get(field) for field in TOTALS}},
+        {"$set": {
+            "semester_gpa": gpa(record.get('semester_grade_points', 0), record.get('semester_credits', 0)),
+            "cumulative_gpa": gpa(record.get('total_grade_points', 0), record.get('total_credits', 0)),
+        }}
+    ).modified_count
+
+
+# -------------------------------------------------------------
+# Bulk: a whole semester from course_results
+# -------------------------------------------------------------
+def semester_pipeline(semester, semesters_to_date, students=None):
+    """Per-student semester and cumulative totals for everyone with results in semester."""
+    current = {"$eq": ["$academic_semester", semester]}
+    points = {"$multiply": ["$grade_point", "$credit_hours"]}
+    match = {"academic_semester": {"$in": semesters_to_date}, "status": FINALIZED, "grade_point": {"$ne": None}}
+    if students is not None:
+        match["student"] = {"$in": students}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$student",
+            "in_semester": {"$max": {"$cond": [current, 1, 0]}},
+            "semester_credits": {"$sum": {"$cond": [current, "$credit_hours", 0]}},
+            "semester_grade_points": {"$sum": {"$cond": [current, points, 0]}},
+            "total_credits": {"$sum": "$credit_hours"},
+            "total_grade_points": {"$sum": points},
+            "applied_results": {"$push": "$_id"},
+            "course_grades": {"$push": {"$cond": [current, {
+                "course": "$course", "credits": "$credit_hours",
+                "grade": "$final_grade", "grade_point": "$grade_point",
+            }, None]}},
+        }},
+        {"$match": {"in_semester": 1}},
+        {"$project": {
+            "semester_credits": 1, "semester_grade_points": 1, "total_credits": 1, "total_grade_points": 1,
+            "applied_results": 1,
+            "course_grades": {"$filter": {"input": "$course_grades", "as": "g", "cond": {"$ne": ["$$g", None]}}},
+        }},
+    ]
+
+
+def expected_totals(db, semester, calendar=None, students=None):
+    """Cursor over the recomputed totals for a semester (see semester_pipeline)."""
+    calendar = calendar or SemesterCalendar(db)
+    semesters_to_date = [semester, *calendar.before(semester)]
+    return db["course_results"].aggregate(semester_pipeline(semester, semesters_to_date, students), allowDiskUse=True)
+
+
+def rebuild_semester(db, semester, batch_size=BATCH_SIZE, calendar=None, log=print):
+    """Recalculate every student's record for a semester; returns (students, students_per_second).
+
+    Rebuild semesters oldest first: a semester's cumulative totals are read
+    from course_results, but later semesters' records are not touched.
+    """
+    now = datetime.now()
+    records = db["student_semester_records"]
+    db["course_results"].update_many(
+        {"academic_semester": semester, "status": FINALIZED, "grade_point": {"$ne": None}},
+        {"$set": {"gpa_applied": True}}
+    )
+
+    started = time.perf_counter()
+    done = 0
+    for batch in batched(expected_totals(db, semester, calendar), batch_size):
+        ops = [
+            UpdateOne(
+                {"student": row['_id'], "academic_semester": semester},
+                {
+                    "$set": {
+                        "semester_credits": row['semester_credits'],
+                        "semester_grade_points": row['semester_grade_points'],
+                        "semester_gpa": gpa(row['semester_grade_points'], row['semester_credits']),
+                        "total_credits": row['total_credits'],
+                        "total_grade_points": row['total_grade_points'],
+                        "cumulative_gpa": gpa(row['total_grade_points'], row['total_credits']),
+                        "course_grades": row['course_grades'],
+                        "applied_results": row['applied_results'],
+                        "last_modification_time": now,
+                    },
+                    "$setOnInsert": {"status": IN_PROGRESS, "creation_time": now, "is_active": True, "is_deleted": False},
+                },
+                upsert=True
+            )
+            for row in batch
+        ]
+        records.bulk_write(ops, ordered=False)
+        done += len(batch)
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        log(f"  {done} students rebuilt ({rate:,.0f}/s)")
+
+    return done, done / max(time.perf_counter() - started, 1e-9)
+
+
+def check_semester(db, semester, calendar=None, tolerance=1e-6):
+    """Compare stored records with course_results; returns a list of mismatches."""
+    records = db["student_semester_records"]
+    mismatches = []
+    seen = set()
+    fields = (*TOTALS, "semester_gpa", "cumulative_gpa")
+
+    for expected in expected_totals(db, semester, calendar):
+        student = expected['_id']
+        seen.add(student)
+        stored = records.find_one({"student": student, "academic_semester": semester}, dict.fromkeys(fields, 1))
+        if stored is None:
+            mismatches.append({"student": student, "field": None, "stored": None, "expected": "record"})
+            continue
+        expected['semester_gpa'] = gpa(expected['semester_grade_points'], expected['semester_credits'])
+        expected['cumulative_gpa'] = gpa(expected['total_grade_points'], expected['total_credits'])
+        for field in fields:
+            if abs((stored.get(field) or 0) - expected[field]) > tolerance:
+                mismatches.append({"student": student, "field": field,
+                                   "stored": stored.get(field), "expected": expected[field]})
+
+    # Records with credits but no finalised results behind them
+    for stored in records.find({"academic_semester": semester, "semester_credits": {"$gt": 0}}, {"student": 1, "semester_credits": 1}):
+        if stored['student'] not in seen:
+            mismatches.append({"student": stored['student'], "field": "semester_credits",
+                               "stored": stored['semester_credits'], "expected": 0})
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain GPA totals in student_semester_records")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("finalise", help="finalise one course result").add_argument("result_id")
+    rebuild = commands.add_parser("rebuild", help="recalculate a semester from course_results")
+    rebuild.add_argument("semester_id")
+    rebuild.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    commands.add_parser("check", help="report records that disagree with course_results").add_argument("semester_id")
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    if args.command == "finalise":
+        applied = finalise_result(mongo.db, ObjectId(args.result_id))
+        print("✅ Finalised" if applied else "Nothing to do: already applied or no grade point")
+    elif args.command == "rebuild":
+        students, rate = rebuild_semester(mongo.db, ObjectId(args.semester_id), args.batch_size)
+        print(f"✅ Rebuilt {students} students ({rate:,.0f} students/s)")
+    else:
+        mismatches = check_semester(mongo.db, ObjectId(args.semester_id))
+        for m in mismatches:
+            print(f"  {m['student']}: {m['field']} stored={m['stored']} expected={m['expected']}")
+        print(f"{'❌' if mismatches else '✅'} {len(mismatches)} mismatches")
+        raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def normalise_answer(value):
+    """Canonical form used to compare submitted and expected answers."""
+    if value is None:
+        return None
+    return str(value).strip()
+
+
+def field_names(count):
+    """Form field names used by start_exam.html for each question."""
+    return tuple(f"q{idx}" for idx in range(1, count + 1))
+
+
+class AnswerKey:
+    """An exam's questions compiled once for grading.
+
+    Expected answers are normalised up front, so scoring a submission is a
+    single pass over (field, expected, marks) tuples. Questions without an
+    answer (open-ended) count towards the total but are never auto-graded.
+    """
+
+    def __init__(self, questions):
+        self.fields = field_names(len(questions))
+        self.expected = tuple(normalise_answer(q.get('answer')) for q in questions)
+        self.marks = tuple(q.get('marks', 1) for q in questions)
+        self.question_ids = tuple(q.get('question', q.get('_id')) for q in questions)
+        self.total = sum(self.marks)
+        self._gradable = tuple(
+            (field, expected, marks)
+            for field, expected, marks in zip(self.fields, self.expected, self.marks)
+            if expected is not None
+        )
+        self._marks_array = np.array([marks for _, _, marks in self._gradable])
+
+    def __len__(self):
+        return len(self.fields)
+
+    @property
+    def gradable(self):
+        """Number of questions that can be auto-graded."""
+        return len(self._gradable)
+
+    @property
+    def gradable_fields(self):
+        return tuple(field for field, _, _ in self._gradable)
+
+    def score(self, answers):
+        """Score a mapping of field name -> submitted answer (e.g. request.form)."""
+        get = answers.get
+        score = 0
+        for field, expected, marks in self._gradable:
+            submitted = get(field)
+            if submitted is not None and str(submitted).strip() == expected:
+                score += marks
+        return score
+
+    def correct(self, answers):
+        """Fields of the auto-graded questions answered correctly."""
+        get = answers.get
+        return [field for field, expected, _ in self._gradable
+                if get(field) is not None and str(get(field)).strip() == expected]
+
+    def score_list(self, answers):
+        """Score answers given positionally, in question order."""
+        return self.score(dict(zip(self.fields, answers)))
+
+    def correct_matrix(self, submissions):
+        """Boolean (submissions x gradable questions) array: answered correctly.
+
+        Built in the same single pass as correct(); it is for per-question
+        statistics (column sums, matrix @ marks gives the scores). To score
+        alone, score() is cheaper.
+        """
+        rows = []
+        for answers in submissions:
+            get = answers.get
+            rows.append([get(field) is not None and str(get(field)).strip() == expected
+                         for field, expected, _ in self._gradable])
+        return np.array(rows, dtype=bool).reshape(len(submissions), len(self._gradable))
+
+    @property
+    def marks_array(self):
+        """Marks of the gradable questions, in correct_matrix() column order."""
+        return self._marks_array
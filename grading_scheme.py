@@ -0,0 +1,137 @@
+# ---- grading_scheme.py ----
+# Letter grades and grade points for a whole exam at once: scores become
+# percentages, optionally curved or normalised, then mapped onto grade bands
+# with array operations and written back to exam_results in bulk.
+# Run with: python grading_scheme.py <exam_id> [--mode bands|curve|normalise] [--dry-run]
+import argparse
+from datetime import datetime
+
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from regrade import BATCH_SIZE
+
+MODES = ("bands", "curve", "normalise")
+
+# (minimum percentage, grade, grade point), highest band first
+DEFAULT_BANDS = [
+    (80, "A", 4.0),
+    (75, "A-", 3.67),
+    (70, "B+", 3.33),
+    (65, "B", 3.0),
+    (60, "B-", 2.67),
+    (55, "C+", 2.33),
+    (50, "C", 2.0),
+    (45, "D+", 1.67),
+    (40, "D", 1.0),
+    (0, "F", 0.0),
+]
+
+RESULT_FIELDS = {"score": 1, "total": 1, "marks": 1}
+
+
+class GradingScheme:
+    """Maps percentages to grades and grade points.
+
+    mode 'bands' uses the raw percentages; 'curve' shifts every percentage so
+    the mean lands on target_mean; 'normalise' rescales to target_mean and
+    target_std. Adjusted percentages are clipped to 0-100.
+    """
+
+    def __init__(self, bands=DEFAULT_BANDS, mode="bands", target_mean=70.0, target_std=10.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown grading mode: {mode}")
+        ordered = sorted(bands)     # ascending thresholds for searchsorted
+        self.thresholds = np.array([minimum for minimum, _, _ in ordered], dtype=float)
+        self.grades = np.array([grade for _, grade, _ in ordered], dtype=object)
+        self.points = np.array([point for _, _, point in ordered], dtype=float)
+        self.mode = mode
+        self.target_mean = target_mean
+        self.target_std = target_std
+
+    def adjust(self, percentages):
+        """Apply the curve or normalisation to an array of percentages."""
+        percentages = np.asarray(percentages, dtype=float)
+        if self.mode == "curve" and len(percentages):
+            percentages = percentages + (self.target_mean - percentages.mean())
+        elif self.mode == "normalise" and len(percentages):
+            std = percentages.std()
+            z = (percentages - percentages.mean()) / std if std else np.zeros_like(percentages)
+            percentages = self.target_mean + z * self.target_std
+        return np.clip(percentages, 0, 100)
+
+    def assign(self, percentages):
+        """Return (adjusted percentages, grades, grade points) arrays."""
+        adjusted = self.adjust(percentages)
+        band = np.searchsorted(self.thresholds, adjusted, side="right") - 1
+        band = np.maximum(band, 0)      # below the lowest threshold: lowest band
+        return adjusted, self.grades[band], self.points[band]
+
+
+def result_percentages(results):
+    """Percentages for exam_results documents: score/total, else 'marks' (already out of 100)."""
+    score = np.array([r.get('score', np.nan) if r.get('total') else np.nan for r in results], dtype=float)
+    total = np.array([r.get('total') or np.nan for r in results], dtype=float)
+    marks = np.array([r.get('marks', np.nan) for r in results], dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(np.isnan(score), marks, score / total * 100)
+
+
+def apply_scheme(db, exam_oid, scheme, dry_run=False, batch_size=BATCH_SIZE, user=None):
+    """Grade every result of an exam; returns a preview dict.
+
+    With dry_run nothing is written: the preview holds the grade
+    distribution and the before/after mean so the scheme can be checked
+    first.
+    """
+    results = list(db["exam_results"].find({"exam": exam_oid}, RESULT_FIELDS))
+    percentages = result_percentages(results)
+    graded = ~np.isnan(percentages)
+    adjusted, grades, points = scheme.assign(percentages[graded])
+
+    labels, counts = np.unique(grades.astype(str), return_counts=True) if len(grades) else ([], [])
+    preview = {
+        "results": len(results),
+        "graded": int(graded.sum()),
+        "mode": scheme.mode,
+        "mean_before": round(float(percentages[graded].mean()), 2) if len(adjusted) else None,
+        "mean_after": round(float(adjusted.mean()), 2) if len(adjusted) else None,
+        "distribution": {str(label): int(count) for label, count in zip(labels, counts)},
+    }
+    if dry_run:
+        return preview
+
+    now = datetime.now()
+    graded_results = [r for r, ok in zip(results, graded) if ok]
+    ops = [
+        UpdateOne({"_id": r['_id']}, {"$set": {
+            "grade": grade, "grade_point": float(point), "adjusted_percentage": round(float(pct), 2),
+            "grading_mode": scheme.mode, "graded_at": now, "last_modification_user_id": user,
+        }})
+        for r, pct, grade, point in zip(graded_results, adjusted, grades, points)
+    ]
+    for start in range(0, len(ops), batch_size):
+        db["exam_results"].bulk_write(ops[start:start + batch_size], ordered=False)
+    return preview
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Assign grades to every result of an exam")
+    parser.add_argument("exam_id")
+    parser.add_argument("--mode", choices=MODES, default="bands")
+    parser.add_argument("--target-mean", type=float, default=70.0)
+    parser.add_argument("--target-std", type=float, default=10.0)
+    parser.add_argument("--dry-run", action="store_true", help="preview the distribution without writing")
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    scheme = GradingScheme(mode=args.mode, target_mean=args.target_mean, target_std=args.target_std)
+    preview = apply_scheme(mongo.db, ObjectId(args.exam_id), scheme, dry_run=args.dry_run)
+    print(f"{'Preview' if args.dry_run else '✅ Graded'}: {preview['graded']} of {preview['results']} results, "
+          f"mean {preview['mean_before']} -> {preview['mean_after']}")
+    for grade, count in sorted(preview['distribution'].items()):
+        print(f"  {grade:<3} {count}")
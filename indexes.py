@@ -0,0 +1,287 @@
+# ---- indexes.py ----
+# The index registry: every index the app, seed.py and loadgen.py rely on,
+# per collection. reconcile() creates what is missing (create_index is a
+# no-op for existing ones) and reports extras and conflicts; self_check()
+# explains each route's hot queries and fails on any COLLSCAN.
+# Run with: python indexes.py [--check] [--drop-extra]
+import argparse
+import logging
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from listing import STATUSES, page_query, scope_filter, student_scope_pipeline
+from views import STUDENT_ID
+
+log = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        IndexModel("email", unique=True),
+        IndexModel("role"),
+    ],
+    "courses": [
+        IndexModel([("name", 1)]),
+    ],
+
+    # Open-ended questions (for exams)
+    "questions": [
+        IndexModel([("course", 1), ("educator", 1)]),
+    ],
+    "exam_questions": [
+        IndexModel([("exam", 1), ("order_index", 1)]),       # publish.py snapshot
+    ],
+
+    # Exam listing (dashboard keyset pagination on start_at/_id) and the
+    # student scope (by course), semester exports and status filters
+    "exams": [
+        IndexModel([("start_at", 1), ("_id", 1)]),
+        IndexModel([("end_at", 1)]),
+        IndexModel([("course", 1), ("start_at", 1)]),
+        IndexModel([("academic_semester", 1)]),
+        IndexModel([("status", 1), ("start_at", 1)]),
+    ],
+
+    # Student-scoped dashboard
+    "students": [
+        IndexModel("student_id", unique=True),
+    ],
+    "enrollments": [
+        IndexModel([("student", 1), ("course", 1)]),
+    ],
+    "exam_students": [
+        IndexModel([("student", 1), ("exam", 1)]),
+        IndexModel([("exam", 1), ("student", 1)]),
+    ],
+
+    # Exam runtime data
+    "exam_schedules": [
+        IndexModel([("exam", 1)]),
+    ],
+    "exam_results": [
+        IndexModel([("exam", 1), ("student", 1), ("attempt", 1)], unique=True),    # one result per attempt
+        IndexModel([("exam", 1), ("student", 1), ("_id", -1)]),    # latest result per student
+        IndexModel([("student", 1), ("exam", 1)]),                 # a student's results
+    ],
+    "exam_submissions": [
+        IndexModel([("exam", 1), ("_id", 1)]),                     # regrade.py, stats.py scans
+        IndexModel([("exam", 1), ("student", 1), ("attempt", 1)], unique=True),
+    ],
+    "exam_answers": [
+        IndexModel([("submission", 1)]),
+    ],
+    "exam_drafts": [
+        IndexModel([("exam", 1), ("student", 1)], unique=True),
+    ],
+
+    # Exam timers (per-student deadlines, pauses, extensions)
+    "exam_timers": [
+        IndexModel([("exam", 1), ("student", 1)], unique=True),
+        IndexModel([("status", 1), ("deadline", 1)]),
+    ],
+    "time_extensions": [
+        IndexModel([("exam", 1), ("student", 1)]),
+    ],
+    "pause_exams": [
+        IndexModel([("exam_student.exam", 1), ("exam_student.student", 1)]),
+    ],
+    "invigilators": [
+        IndexModel([("exam_schedule", 1)]),
+    ],
+
+    # Live exam events (events.py polls by exam, newest _id first seen)
+    "exam_chats": [
+        IndexModel([("exam", 1), ("_id", 1)]),
+    ],
+
+    # Student semester records (GPA/CGPA history)
+    "student_semester_records": [
+        IndexModel([("student", 1), ("academic_semester", 1)], unique=True),
+        IndexModel([("status", 1)]),
+        IndexModel([("academic_semester", 1)]),             # export.py, gpa.py check
+        IndexModel([("student", 1), ("finalized_date", -1)]),
+    ],
+
+    # Course results (final course grades)
+    "course_results": [
+        IndexModel([("student", 1), ("course", 1), ("academic_semester", 1)], unique=True),
+        IndexModel([("course", 1), ("academic_semester", 1), ("status", 1)]),
+        IndexModel([("student", 1), ("academic_semester", 1)]),
+        IndexModel([("status", 1)]),
+        IndexModel([("academic_semester", 1), ("status", 1)]),   # gpa.py semester rebuilds
+    ],
+
+    # Academic semesters
+    "semesters": [
+        IndexModel([("semester_code", 1)], unique=True),
+        IndexModel([("status", 1)]),
+        IndexModel([("start_date", 1)]),
+    ],
+}
+
+# Options that must match for an existing index to count as the declared one
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def reconcile(db, drop_extra=False):
+    """Create missing registry indexes; returns {'created', 'conflicts', 'extra'} lists.
+
+    A conflict is an index with the declared keys but different options; it
+    is reported, never replaced. Indexes not in the registry are dropped
+    only with drop_extra.
+    """
+    report = {"created": [], "conflicts": [], "extra": []}
+    for name, models in INDEXES.items():
+        collection = db[name]
+        existing = {tuple(info['key']): info for info in collection.index_information().values()}
+        declared = set()
+
+        missing = []
+        for model in models:
+            spec = model.document
+            keys = tuple(spec['key'].items())
+            declared.add(keys)
+            info = existing.get(keys)
+            if info is None:
+                missing.append(model)
+            elif any(bool(info.get(opt)) != bool(spec.get(opt)) for opt in COMPARED_OPTIONS):
+                report['conflicts'].append(f"{name}.{info.get('name', keys)}")
+        if missing:
+            report['created'].extend(f"{name}.{n}" for n in collection.create_indexes(missing))
+
+        for keys, info in existing.items():
+            if keys not in declared and keys != (("_id", 1),):
+                report['extra'].append(f"{name}.{info.get('name', keys)}")
+                if drop_extra:
+                    collection.drop_index(list(keys))
+    return report
+
+
+def create_indexes(db):
+    """Create every registry index (seed.py, loadgen.py)."""
+    return reconcile(db)['created']
+
+
+# -------------------------------------------------------------
+# Self-check: no hot query may scan a whole collection
+# -------------------------------------------------------------
+def hot_queries(now=None):
+    """Yield (route, collection, command) for the queries the routes run.
+
+    Commands are find or aggregate bodies for the explain command; the ids
+    are placeholders, only the query shapes matter.
+    """
+    now = now or datetime.now()
+    exam, other, student = ObjectId(), ObjectId(), STUDENT_ID
+    scope = scope_filter({"exams": [exam], "courses": [other]})
+
+    # dashboard
+    yield "dashboard", "students", {"aggregate": "students", "pipeline": student_scope_pipeline(student), "cursor": {}}
+    for status in STATUSES:
+        query, sort = page_query(status, now, scope=scope)
+        yield "dashboard", "exams", {"find": "exams", "filter": query, "sort": dict(sort), "limit": 21}
+
+    # start_exam / submit_exam / autosave
+    yield "start_exam", "exams", {"find": "exams", "filter": {"_id": exam}}
+    yield "start_exam", "exam_timers", {"find": "exam_timers", "filter": {"exam": exam, "student": student}}
+    yield "start_exam", "time_extensions", {"aggregate": "time_extensions", "cursor": {}, "pipeline": [
+        {"$match": {"exam": exam, "student": {"$in": [student, None]}}},
+        {"$group": {"_id": None, "minutes": {"$sum": "$minutes"}}},
+    ]}
+    yield "submit_exam", "exam_drafts", {"find": "exam_drafts", "filter": {"exam": exam, "student": student}}
+    yield "submit_exam", "exam_results", {"find": "exam_results",
+                                          "filter": {"exam": exam, "student": student, "attempt": 1}}
+
+    # exam_result / stats
+    yield "exam_result", "exam_results", {"find": "exam_results", "filter": {"exam": exam, "student": student},
+                                          "sort": {"_id": -1}, "limit": 1}
+    yield "exam_stats", "exam_stats", {"find": "exam_stats", "filter": {"_id": exam}}
+
+    # exam_events (polling fallback)
+    yield "exam_events", "exam_chats", {"find": "exam_chats", "filter": {"exam": exam, "_id": {"$gt": other}},
+                                        "sort": {"_id": 1}}
+    yield "exam_events", "time_extensions", {"find": "time_extensions",
+                                             "filter": {"exam": exam, "_id": {"$gt": other}}, "sort": {"_id": 1}}
+    yield "exam_events", "pause_exams", {"find": "pause_exams", "filter": {"exam_student.exam": exam, "$or": [
+        {"_id": {"$gt": other}}, {"resume_timestamp": {"$gte": now}},
+    ]}, "sort": {"_id": 1}}
+
+    # Timer start-up and export / regrade batch jobs
+    yield "timer_load", "exam_timers", {"find": "exam_timers", "filter": {"status": "RUNNING", "paused_at": None}}
+    yield "regrade", "exam_submissions", {"find": "exam_submissions", "filter": {"exam": exam}, "sort": {"_id": 1}}
+    yield "export", "course_results", {"find": "course_results", "filter": {"academic_semester": {"$in": [exam]}},
+                                       "sort": {"_id": 1}}
+    yield "export", "exams", {"find": "exams", "filter": {"academic_semester": {"$in": [exam]}}}
+
+
+def plan_stages(plan):
+    """Every 'stage' name in an explain document.
+
+    $lookup joins pushed down to the query engine show as EQ_LOOKUP; only the
+    IndexedLoopJoin strategy uses an index on the joined collection.
+    """
+    if isinstance(plan, dict):
+        if plan.get('stage') == "EQ_LOOKUP" and plan.get('strategy') != "IndexedLoopJoin":
+            yield "COLLSCAN"
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+def winning_plans(explain):
+    """The winningPlan sections of an explain document (nested for aggregations)."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from winning_plans(value)
+
+
+def self_check(db, log=print):
+    """Explain every hot query; returns the (route, collection) pairs that COLLSCAN."""
+    scans = []
+    for route, collection, command in hot_queries():
+        try:
+            explain = db.command("explain", command, verbosity="queryPlanner")
+        except OperationFailure as exc:
+            log(f"  {route:<14} {collection:<24} explain failed: {exc}")
+            scans.append((route, collection))
+            continue
+        stages = {stage for plan in winning_plans(explain) for stage in plan_stages(plan)}
+        scanned = "COLLSCAN" in stages
+        if scanned:
+            scans.append((route, collection))
+        log(f"  {route:<14} {collection:<24} {'COLLSCAN' if scanned else 'ok':<9} {', '.join(sorted(stages))}")
+    return scans
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconcile the index registry with the database")
+    parser.add_argument("--check", action="store_true", help="explain the hot queries, fail on any COLLSCAN")
+    parser.add_argument("--drop-extra", action="store_true", help="drop indexes not in the registry")
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    report = reconcile(mongo.db, drop_extra=args.drop_extra)
+    for kind in ("created", "conflicts", "extra"):
+        for index in report[kind]:
+            print(f"  {kind:<9} {index}")
+    print(f"✅ Indexes reconciled ({len(report['created'])} created, {len(report['conflicts'])} conflicts)")
+
+    if args.check:
+        scans = self_check(mongo.db)
+        print(f"{'❌' if scans else '✅'} {len(scans)} hot queries scan a whole collection")
+        raise SystemExit(1 if scans or report['conflicts'] else 0)
@@ -0,0 +1,121 @@
+import base64
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+PAGE_SIZE = 20
+STATUSES = ("Active", "Upcoming", "Ended")
+
+# Only the fields the dashboard template needs
+DASHBOARD_FIELDS = {
+    "title": 1,
+    "duration": 1,
+    "duration_minutes": 1,
+    "start_at": 1,
+    "end_at": 1,
+}
+
+
+# -------------------------------------------------------------
+# Keyset cursors on (start_at, _id)
+# -------------------------------------------------------------
+def encode_cursor(exam):
+    """Encode the (start_at, _id) position of an exam as an opaque string."""
+    raw = f"{exam['start_at'].isoformat()}|{exam['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); raises ValueError when malformed."""
+    try:
+        start_at, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_at), ObjectId(oid)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+# -------------------------------------------------------------
+# Query building
+# -------------------------------------------------------------
+def student_scope_pipeline(student_code):
+    """Aggregation on students resolving one student's exams and courses.
+
+    The $lookups go through the (student, ...) indexes of exam_students and
+    enrollments, so the cost depends on that student only.
+    """
+    return [
+        {"$match": {"student_id": student_code}},
+        {"$limit": 1},
+        {"$lookup": {"from": "exam_students", "localField": "_id", "foreignField": "student", "as": "sittings"}},
+        {"$lookup": {"from": "enrollments", "localField": "_id", "foreignField": "student", "as": "enrolled"}},
+        {"$project": {
+            "exams": "$sittings.exam",
+            "courses": {"$map": {
+                "input": {"$filter": {"input": "$enrolled", "cond": {"$eq": ["$$this.status", "ACTIVE"]}}},
+                "in": "$$this.course"
+            }}
+        }},
+    ]
+
+
+def scope_filter(found):
+    """Turn a student_scope_pipeline() result into an exams filter."""
+    if not found:
+        # Unknown students see no exams
+        return {"_id": {"$in": []}}
+    return {"$or": [{"_id": {"$in": found["exams"]}}, {"course": {"$in": found["courses"]}}]}
+
+
+def student_scope(db, student_code):
+    """Return an exams filter limited to the exams one student sits or is enrolled for."""
+    return scope_filter(next(db["students"].aggregate(student_scope_pipeline(student_code)), None))
+
+
+def status_filter(status, now):
+    """Translate a dashboard status into a query on start_at/end_at."""
+    if status == "Upcoming":
+        return {"start_at": {"$gt": now}}
+    if status == "Active":
+        return {"start_at": {"$lte": now}, "end_at": {"$gte": now}}
+    if status == "Ended":
+        return {"end_at": {"$lt": now}}
+    raise ValueError(f"Unknown status: {status}")
+
+
+def is_descending(status):
+    # Most recent first for ended exams, soonest first otherwise
+    return status == "Ended"
+
+
+def page_query(status, now, cursor=None, scope=None):
+    """Build the filter and sort for one page of exams with the given status."""
+    clauses = [status_filter(status, now)]
+    if scope is not None:
+        clauses.append(scope)
+
+    descending = is_descending(status)
+    if cursor:
+        start_at, oid = decode_cursor(cursor)
+        op = "$lt" if descending else "$gt"
+        clauses.append({"$or": [
+            {"start_at": {op: start_at}},
+            {"start_at": start_at, "_id": {op: oid}},
+        ]})
+
+    direction = -1 if descending else 1
+    sort = [("start_at", direction), ("_id", direction)]
+    return {"$and": clauses}, sort
+
+
+def split_page(exams, limit=PAGE_SIZE):
+    """Trim a limit + 1 result to one page; returns (exams, next_cursor)."""
+    if len(exams) > limit:
+        exams = exams[:limit]
+        return exams, encode_cursor(exams[-1])
+    return exams, None
+
+
+def fetch_page(collection, status, now, cursor=None, scope=None, limit=PAGE_SIZE):
+    """Return (exams, next_cursor) for one page of the dashboard listing."""
+    query, sort = page_query(status, now, cursor, scope)
+    return split_page(list(collection.find(query, DASHBOARD_FIELDS).sort(sort).limit(limit + 1)), limit)
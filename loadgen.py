@@ -0,0 +1,313 @@
+# ---- loadgen.py ----
+# Synthetic load data in the seed.py schema, for capacity testing: N
+# institutions with their students, courses, semesters, exams (published
+# question snapshots + question bank), sittings, submissions, results, course
+# results and GPA records. Same seed, same data (dates relative to today).
+# Documents go in with batched insert_many(ordered=False); indexes are built
+# once the load is done.
+# Run with: python loadgen.py [--drop] [--students N] ... (see --help)
+# 1M exam results: python loadgen.py --drop --institutions 2 --students 10000 --semesters 6
+import argparse
+import math
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+from audit import audit
+from config import Config
+from gpa import FINALIZED, rebuild_semester
+from grading import field_names
+from grading_scheme import GradingScheme
+from indexes import create_indexes
+from schedule import DATE_FORMAT, TIME_FORMAT
+from views import STUDENT_ID
+
+BATCH_SIZE = 10000
+OPTIONS = ["A", "B", "C", "D"]
+EXAM_HOUR = 9
+EXAM_MINUTES = 90
+
+
+class IdFactory:
+    """Deterministic, increasing ObjectIds (fixed timestamp + counter)."""
+
+    def __init__(self, created=datetime(2024, 1, 1)):
+        self.prefix = struct.pack(">I", int(created.timestamp()))
+        self.counter = 0
+
+    def __call__(self):
+        self.counter += 1
+        return ObjectId(self.prefix + self.counter.to_bytes(8, "big"))
+
+
+class BatchWriter:
+    """Per-collection buffers flushed with insert_many(ordered=False)."""
+
+    def __init__(self, db, batch_size=BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, collection, doc):
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection)
+
+    def flush(self, collection=None):
+        for name in [collection] if collection else list(self.buffers):
+            buffer = self.buffers.get(name)
+            if buffer:
+                self.db[name].insert_many(buffer, ordered=False)
+                self.counts[name] = self.counts.get(name, 0) + len(buffer)
+                self.buffers[name] = []
+
+
+def make_semesters(out, new_id, n_semesters, now, admin):
+    """n_semesters half-year semesters, the last one running now."""
+    semesters = []
+    for k in range(n_semesters):
+        start = now - timedelta(days=30 + 182 * (n_semesters - 1 - k))
+        end = start + timedelta(days=150)
+        doc = {
+            "_id": new_id(),
+            "semester_code": f"{start:%Y-%m}",
+            "semester_name": f"Semester starting {start:%B %Y}",
+            "start_date": start.replace(hour=0, minute=0, second=0, microsecond=0),
+            "end_date": end.replace(hour=0, minute=0, second=0, microsecond=0),
+            "status": "ACTIVE" if k == n_semesters - 1 else "COMPLETED",
+            **audit(admin, created=start),
+        }
+        out.add("semesters", doc)
+        semesters.append(doc)
+    return semesters
+
+
+def exam_dates(semester, n_exams, now, current, rng):
+    """Start times for a course's exams: spread over a past semester; around now in the current one."""
+    if current:
+        # Some ended, one running, some upcoming, so every dashboard tab has rows
+        offsets = [timedelta(days=rng.randint(-20, 20), hours=rng.randint(-2, 2)) for _ in range(n_exams)]
+        offsets[0] = timedelta(minutes=-rng.randint(0, EXAM_MINUTES - 10))
+        return [now + offset for offset in offsets]
+    span = (semester['end_date'] - semester['start_date']).days
+    return [
+        semester['start_date'] + timedelta(days=rng.randint(14, span - 7), hours=EXAM_HOUR)
+        for _ in range(n_exams)
+    ]
+
+
+def generate(db, args, log=print):
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    new_id = IdFactory()
+    out = BatchWriter(db, args.batch_size)
+    scheme = GradingScheme()
+    now = datetime.now().replace(second=0, microsecond=0)
+    fields = field_names(args.questions)
+
+    admin = new_id()
+    out.add("users", {"_id": admin, "name": "System Admin", "email": "admin@load.eduassess.edu",
+                      "password": "hashed-admin-pass", "role": "ADMIN", **audit(admin)})
+    semesters = make_semesters(out, new_id, args.semesters, now, admin)
+
+    for inst in range(args.institutions):
+        registrar = new_id()
+        out.add("users", {"_id": registrar, "name": f"Registrar {inst}", "email": f"registrar@inst{inst}.edu",
+                          "password": "hashed-registrar-pass", "role": "INSTITUTION", **audit(admin)})
+        out.add("institutions", {"_id": new_id(), "name": f"Institute {inst}", "user": registrar, **audit(registrar)})
+        faculty = new_id()
+        out.add("faculties", {"_id": faculty, "name": f"Faculty of Computing {inst}",
+                              "description": "Generated faculty", **audit(registrar)})
+
+        # Educators: one per two courses
+        educators = []
+        for e in range(max(1, args.courses // 2)):
+            user = new_id()
+            educator = new_id()
+            out.add("users", {"_id": user, "name": f"Educator {inst}-{e}", "email": f"educator{e}@inst{inst}.edu",
+                              "password": "hashed-pass", "role": "EDUCATOR", **audit(registrar)})
+            out.add("educators", {"_id": educator, "educator_id": f"E-{inst}-{e:04d}", "department": "Computing",
+                                  "user": user, "status": "ACTIVE", **audit(user)})
+            educators.append(educator)
+
+        courses = []
+        for c in range(args.courses):
+            course = {"_id": new_id(), "name": f"Course {inst}-{c}", "code": f"C{inst}{c:03d}",
+                      "course_id": f"C{inst}{c:03d}", "faculty": faculty, "credit_hours": rng.choice((2, 3, 4)),
+                      "description": "Generated course", "status": "ACTIVE", **audit(registrar)}
+            out.add("courses", course)
+            courses.append(course)
+
+        # Students, with an ability that drives their scores
+        students = []
+        ability = np_rng.normal(0, 1, args.students)
+        for s in range(args.students):
+            user = new_id()
+            student = new_id()
+            # The first generated student is the demo student the routes use
+            code = STUDENT_ID if inst == 0 and s == 0 else f"S-{inst}-{s:06d}"
+            out.add("users", {"_id": user, "name": f"Student {inst}-{s}", "email": f"s{s}@student.inst{inst}.edu",
+                              "password": "hashed-student-pass", "role": "STUDENT", **audit(registrar)})
+            out.add("students", {"_id": student, "student_id": code, "grade_level": f"UG-Year{rng.randint(1, 4)}",
+                                 "user": user, **audit(user)})
+            students.append(student)
+
+        # Enrolments: each student takes courses_per_student of the institution's courses
+        roster = {course['_id']: [] for course in courses}
+        for s, student in enumerate(students):
+            for course in rng.sample(courses, min(args.courses_per_student, len(courses))):
+                roster[course['_id']].append(s)
+                out.add("enrollments", {"_id": new_id(), "course": course['_id'], "student": student,
+                                        "enrollment_date": semesters[0]['start_date'], "status": "ACTIVE",
+                                        **audit(registrar)})
+
+        for semester_index, semester in enumerate(semesters):
+            current = semester_index == len(semesters) - 1
+            for course in courses:
+                enrolled = np.array(roster[course['_id']], dtype=int)
+                educator = rng.choice(educators)
+                percent_sum = np.zeros(len(enrolled))
+                graded_exams = 0
+
+                for start_at in exam_dates(semester, args.exams_per_course, now, current, rng):
+                    exam_id = new_id()
+                    end_at = start_at + timedelta(minutes=EXAM_MINUTES)
+                    difficulty = np_rng.normal(0, 1, args.questions)
+                    answers = [rng.choice(OPTIONS) for _ in range(args.questions)]
+                    marks = [rng.choice((1, 2, 5)) for _ in range(args.questions)]
+                    total = sum(marks)
+
+                    snapshot = []
+                    for q in range(args.questions):
+                        question = new_id()
+                        text = f"Generated question {q + 1} for {course['code']}"
+                        out.add("questions", {"_id": question, "question": text, "options": OPTIONS,
+                                              "answer": answers[q], "marks": marks[q], "educator": educator,
+                                              "course": course['_id'], "created_date": semester['start_date'],
+                                              **audit(educator)})
+                        entry = {"question": question, "order_index": q + 1, "section": "A",
+                                 "question_text": text, "marks": marks[q], "model_answer": None, "rubric": None,
+                                 "options": OPTIONS, "answer": answers[q]}
+                        out.add("exam_questions", {"_id": new_id(), "exam": exam_id, "question": question,
+                                                   "order_index": q + 1, "section": "A", "marks_override": None,
+                                                   "question_text_override": None, "model_answer_override": None,
+                                                   "rubric_override": None, "snapshot": entry, **audit(educator)})
+                        snapshot.append(entry)
+
+                    out.add("exams", {
+                        "_id": exam_id, "title": f"{course['name']} exam {start_at:%Y-%m-%d}",
+                        "course": course['_id'], "educator": educator, "academic_semester": semester['_id'],
+                        "duration": EXAM_MINUTES, "duration_minutes": EXAM_MINUTES, "status": "SCHEDULED",
+                        "exam_date": start_at.strftime(DATE_FORMAT),
+                        "exam_start_time": start_at.strftime(TIME_FORMAT),
+                        "exam_end_time": end_at.strftime(TIME_FORMAT),
+                        "start_at": start_at, "end_at": end_at,
+                        "questions": snapshot, "total_marks": total, "version": 1, "published_at": start_at,
+                        **audit(educator, created=semester['start_date']),
+                    })
+                    for s in enrolled:
+                        out.add("exam_students", {"_id": new_id(), "exam": exam_id, "student": students[s],
+                                                  "attendance": "PRESENT", "enrollment_date": semester['start_date'],
+                                                  **audit(educator)})
+                    if end_at > now or not len(enrolled):
+                        continue
+
+                    # Item response: P(correct) = sigmoid(ability - difficulty)
+                    p_correct = 1 / (1 + np.exp(-(ability[enrolled][:, None] - difficulty[None, :])))
+                    correct = np_rng.random(p_correct.shape) < p_correct
+                    scores = correct @ np.array(marks)
+                    percentages = scores / total * 100
+                    _, grades, points = scheme.assign(percentages)
+                    percent_sum += percentages
+                    graded_exams += 1
+
+                    for row, s in enumerate(enrolled):
+                        submitted_at = start_at + timedelta(minutes=rng.randint(30, EXAM_MINUTES))
+                        given = {
+                            fields[q]: answers[q] if correct[row, q] else rng.choice([o for o in OPTIONS if o != answers[q]])
+                            for q in range(args.questions)
+                        }
+                        out.add("exam_submissions", {"_id": new_id(), "exam": exam_id, "student": students[s],
+                                                     "attempt": 1, "answers": given, "submission_date": submitted_at})
+                        out.add("exam_results", {
+                            "_id": new_id(), "exam": exam_id, "student": students[s], "attempt": 1,
+                            "score": int(scores[row]), "total": total,
+                            "correct": [fields[q] for q in np.flatnonzero(correct[row])],
+                            "grade": grades[row], "grade_point": float(points[row]),
+                            "submitted_at": submitted_at, "status": "SUBMITTED",
+                        })
+
+                if current or not graded_exams:
+                    continue
+                # Final course grade: the mean of the semester's exams
+                final = percent_sum / graded_exams
+                _, grades, points = scheme.assign(final)
+                for row, s in enumerate(enrolled):
+                    out.add("course_results", {
+                        "_id": new_id(), "student": students[s], "course": course['_id'],
+                        "academic_semester": semester['_id'], "final_grade": grades[row],
+                        "final_percentage": round(float(final[row]), 2), "grade_point": float(points[row]),
+                        "credit_hours": course['credit_hours'], "entered_by": educator,
+                        "entered_at": semester['end_date'], "status": FINALIZED, "gpa_applied": True,
+                        **audit(educator, created=semester['end_date']),
+                    })
+        log(f"  institution {inst + 1}/{args.institutions} generated")
+
+    out.flush()
+    return out.counts, semesters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset in the seed.py schema")
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--db", default=Config.MONGO_DB)
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--institutions", type=int, default=1)
+    parser.add_argument("--students", type=int, default=1000, help="per institution")
+    parser.add_argument("--courses", type=int, default=10, help="per institution")
+    parser.add_argument("--courses-per-student", type=int, default=5)
+    parser.add_argument("--semesters", type=int, default=3, help="the last one is current")
+    parser.add_argument("--exams-per-course", type=int, default=2, help="per semester")
+    parser.add_argument("--questions", type=int, default=20, help="per exam")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.uri)
+    if args.drop:
+        client.drop_database(args.db)
+    db = client[args.db]
+
+    # Past semesters are fully graded; the current one mostly is not yet
+    expected = (args.institutions * args.students * min(args.courses_per_student, args.courses)
+                * args.exams_per_course * (args.semesters - 1))
+    print(f"Generating about {expected:,} exam results into {args.db}...")
+    started = time.perf_counter()
+    counts, semesters = generate(db, args)
+    loaded = time.perf_counter()
+    total = sum(counts.values())
+    print(f"Loaded {total:,} documents in {loaded - started:.1f} s ({total / max(loaded - started, 1e-9):,.0f} docs/s)")
+    for name, count in sorted(counts.items()):
+        print(f"  {name:<26} {count:>12,}")
+
+    # Indexes after the load: one sort per index instead of per-insert maintenance
+    create_indexes(db)
+    indexed = time.perf_counter()
+    print(f"Built indexes in {indexed - loaded:.1f} s")
+
+    # GPA records from the generated course results, oldest semester first
+    for semester in semesters[:-1]:
+        rebuild_semester(db, semester['_id'], log=lambda message: None)
+    print(f"Rebuilt GPA records in {time.perf_counter() - indexed:.1f} s")
+    print(f"✅ Done in {math.ceil(time.perf_counter() - started)} s")
+
+
+if __name__ == '__main__':
+    main()
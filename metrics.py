@@ -0,0 +1,258 @@
+# ---- metrics.py ----
+# Request instrumentation for the Flask app: per-route latency split into
+# db (MongoDB command time, from a pymongo CommandListener), render (Jinja
+# templates) and compute (the rest: grading, date parsing, ...), MongoDB
+# command counts and latency per route, Prometheus text on /metrics and a
+# slow-request log with the query shapes that made the request slow.
+# Off unless METRICS_ENABLED: then no listener, hook or route is registered.
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, before_render_template, current_app, g, request, template_rendered
+from pymongo import monitoring
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)    # seconds
+PHASES = ("db", "render", "compute")
+BACKGROUND = "background"   # commands outside a request: write-behind, timers, events
+MAX_SHAPES = 50             # query shapes kept per request for the slow log
+SLOW_LOG_SHAPES = 5         # slowest commands listed per slow request
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Command fields that make up a query shape
+SHAPE_KEYS = ("filter", "pipeline", "updates", "deletes", "sort")
+
+_current = ContextVar("request_timer", default=None)
+
+
+def query_shape(value):
+    """A query with every literal replaced by '?': the same shape for every exam/student."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        return shapes[:1] if all(s == "?" for s in shapes) else shapes
+    return "?"
+
+
+def command_shape(event):
+    """'<command> <collection> <shape>' for a CommandStartedEvent."""
+    command = event.command
+    collection = command.get(event.command_name)
+    parts = {key: command[key] for key in SHAPE_KEYS if key in command}
+    if "updates" in parts:
+        parts["updates"] = [{"q": u.get("q"), "u": u.get("u")} for u in parts["updates"][:1]]
+    if "deletes" in parts:
+        parts["deletes"] = [{"q": d.get("q")} for d in parts["deletes"][:1]]
+    collection = collection if isinstance(collection, str) else ""
+    return f"{event.command_name} {collection} {json.dumps(query_shape(parts), default=str)}"
+
+
+class RequestTimer:
+    """Phase timings of the request running in the current context."""
+
+    def __init__(self, route, keep_shapes):
+        self.route = route
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.render = 0.0
+        self.commands = 0
+        self.keep_shapes = keep_shapes
+        self.shapes = []            # (seconds, shape), at most MAX_SHAPES
+        self._pending = {}          # request_id -> shape, while a command runs
+        self._render_depth = 0
+        self._render_started = 0.0
+
+
+class Metrics:
+    """Process-wide counters, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}          # route -> [bucket counts..., count, sum]
+        self.phases = {}            # (route, phase) -> seconds
+        self.commands = {}          # (route, command) -> [count, seconds, failures]
+        self.slow = {}              # route -> slow requests
+
+    def observe_request(self, timer, total, slow):
+        compute = max(total - timer.db - timer.render, 0.0)
+        with self._lock:
+            row = self.requests.setdefault(timer.route, [0] * len(BUCKETS) + [0, 0.0])
+            for i, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    row[i] += 1
+            row[-2] += 1
+            row[-1] += total
+            for phase, seconds in zip(PHASES, (timer.db, timer.render, compute)):
+                self.phases[timer.route, phase] = self.phases.get((timer.route, phase), 0.0) + seconds
+            if slow:
+                self.slow[timer.route] = self.slow.get(timer.route, 0) + 1
+
+    def observe_command(self, route, command, seconds, failed=False):
+        with self._lock:
+            row = self.commands.setdefault((route, command), [0, 0.0, 0])
+            row[0] += 1
+            row[1] += seconds
+            row[2] += failed
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            requests = {route: list(row) for route, row in self.requests.items()}
+            phases = dict(self.phases)
+            commands = {key: list(row) for key, row in self.commands.items()}
+            slow = dict(self.slow)
+
+        lines = [
+            "# HELP exam_request_seconds Request latency by route.",
+            "# TYPE exam_request_seconds histogram",
+        ]
+        for route, row in sorted(requests.items()):
+            for bound, count in zip(BUCKETS, row):
+                lines.append(f'exam_request_seconds_bucket{{route="{label(route)}",le="{bound}"}} {count}')
+            lines.append(f'exam_request_seconds_bucket{{route="{label(route)}",le="+Inf"}} {row[-2]}')
+            lines.append(f'exam_request_seconds_sum{{route="{label(route)}"}} {row[-1]:.6f}')
+            lines.append(f'exam_request_seconds_count{{route="{label(route)}"}} {row[-2]}')
+
+        lines += [
+            "# HELP exam_request_phase_seconds_total Request time by route and phase (db, render, compute).",
+            "# TYPE exam_request_phase_seconds_total counter",
+        ]
+        for (route, phase), seconds in sorted(phases.items()):
+            lines.append(f'exam_request_phase_seconds_total{{route="{label(route)}",phase="{phase}"}} {seconds:.6f}')
+
+        lines += [
+            "# HELP exam_slow_requests_total Requests over SLOW_REQUEST_MS by route.",
+            "# TYPE exam_slow_requests_total counter",
+        ]
+        for route, count in sorted(slow.items()):
+            lines.append(f'exam_slow_requests_total{{route="{label(route)}"}} {count}')
+
+        for name, index, help_text in (
+            ("exam_mongo_commands_total", 0, "MongoDB commands by route and command."),
+            ("exam_mongo_command_seconds_total", 1, "MongoDB command time by route and command."),
+            ("exam_mongo_command_failures_total", 2, "Failed MongoDB commands by route and command."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (route, command), row in sorted(commands.items()):
+                value = f"{row[index]:.6f}" if index == 1 else row[index]
+                lines.append(f'{name}{{route="{label(route)}",command="{label(command)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Adds each MongoDB command's latency to the current request (or BACKGROUND).
+
+    pymongo calls the listener on the thread that runs the command, so the
+    request is found through a context variable.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        timer = _current.get()
+        if timer is not None and timer.keep_shapes:
+            timer._pending[event.request_id] = command_shape(event)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        seconds = event.duration_micros / 1e6
+        timer = _current.get()
+        self.metrics.observe_command(timer.route if timer else BACKGROUND, event.command_name, seconds, failed)
+        if timer is None:
+            return
+        timer.db += seconds
+        timer.commands += 1
+        shape = timer._pending.pop(event.request_id, None)
+        if shape is not None and len(timer.shapes) < MAX_SHAPES:
+            timer.shapes.append((seconds, shape))
+
+
+metrics = Metrics()
+command_timer = CommandTimer(metrics)
+
+
+# -------------------------------------------------------------
+# Flask hooks
+# -------------------------------------------------------------
+def start_request():
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    g.metrics_timer = RequestTimer(request.endpoint or "unmatched", keep_shapes=bool(slow_ms))
+    _current.set(g.metrics_timer)
+
+
+def finish_streamed(response):
+    # A streamed body (events, exports) may run for minutes: time up to here
+    if response.is_streamed:
+        finish_request()
+    return response
+
+
+def finish_request(exc=None):
+    timer = g.pop('metrics_timer', None)
+    if timer is None:
+        return
+    _current.set(None)
+    total = time.perf_counter() - timer.started
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    slow = bool(slow_ms) and total * 1000 >= slow_ms
+    metrics.observe_request(timer, total, slow)
+    if slow:
+        log_slow_request(timer, total)
+
+
+def log_slow_request(timer, total):
+    compute = max(total - timer.db - timer.render, 0.0)
+    slowest = sorted(timer.shapes, key=lambda s: s[0], reverse=True)[:SLOW_LOG_SHAPES]
+    log.warning(
+        "Slow request %s %.0f ms (db %.0f ms in %d commands, render %.0f ms, compute %.0f ms)%s",
+        timer.route, total * 1000, timer.db * 1000, timer.commands, timer.render * 1000, compute * 1000,
+        "".join(f"\n  {seconds * 1000:8.1f} ms  {shape}" for seconds, shape in slowest),
+    )
+
+
+def render_started(sender, template, context, **extra):
+    timer = _current.get()
+    if timer is not None:
+        if timer._render_depth == 0:
+            timer._render_started = time.perf_counter()
+        timer._render_depth += 1
+
+
+def render_finished(sender, template, context, **extra):
+    timer = _current.get()
+    if timer is not None and timer._render_depth:
+        timer._render_depth -= 1
+        if timer._render_depth == 0:
+            timer.render += time.perf_counter() - timer._render_started
+
+
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    """Register the hooks and /metrics when METRICS_ENABLED (the listener: extensions.client_options)."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(start_request)
+    app.after_request(finish_streamed)
+    app.teardown_request(finish_request)
+    before_render_template.connect(render_started, app)
+    template_rendered.connect(render_finished, app)
+    app.add_url_rule('/metrics', view_func=metrics_endpoint)
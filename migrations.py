@@ -0,0 +1,96 @@
+# ---- migrations.py ----
+# One-off data migrations. Run with: python migrations.py
+from datetime import datetime
+
+from pymongo import IndexModel, UpdateOne
+
+from schedule import DEFAULT_TIME, exam_window, parse_exam_window
+from submission_queue import SUBMISSION_KEY
+
+BATCH_SIZE = 500
+
+# Fields parse_exam_window() needs from an exam
+WINDOW_FIELDS = {
+    "exam_date": 1,
+    "exam_time": 1,
+    "exam_start_time": 1,
+    "exam_end_time": 1,
+    "duration": 1,
+    "duration_minutes": 1,
+}
+
+
+def backfill_exam_windows(db, force=False):
+    """Store start_at/end_at datetimes on exams from their string date/time pairs.
+
+    Exams without a date of their own use their exam_schedules entry. Exams
+    with no date anywhere keep the dashboard's old default, today (the day of
+    the backfill) at 09:00, and are counted as unscheduled.
+    Returns (updated, unscheduled).
+    """
+    exams = db["exams"]
+    schedules = db["exam_schedules"]
+    now = datetime.now()
+
+    query = {} if force else {"start_at": {"$exists": False}}
+    ops = []
+    updated = unscheduled = 0
+
+    for exam in exams.find(query, WINDOW_FIELDS).batch_size(BATCH_SIZE):
+        schedule = None
+        if not exam.get('exam_date'):
+            schedule = schedules.find_one({"exam": exam['_id']}, {"date": 1, "time": 1})
+
+        start_at, end_at = parse_exam_window(exam, schedule)
+        if start_at is None:
+            unscheduled += 1
+            start_at, end_at = exam_window(exam, now)
+
+        ops.append(UpdateOne({"_id": exam['_id']}, {"$set": {"start_at": start_at, "end_at": end_at}}))
+        if len(ops) >= BATCH_SIZE:
+            updated += exams.bulk_write(ops, ordered=False).modified_count
+            ops = []
+
+    if ops:
+        updated += exams.bulk_write(ops, ordered=False).modified_count
+    return updated, unscheduled
+
+
+def dedupe_submissions(db):
+    """Keep the first exam_results/exam_submissions document per (exam, student, attempt).
+
+    Later duplicates (double submits from before the unique index) are
+    deleted, then the unique index is built, replacing a non-unique one on
+    the same keys. Returns the number of documents deleted.
+    """
+    keys = [(field, 1) for field in SUBMISSION_KEY]
+    deleted = 0
+    for name in ("exam_results", "exam_submissions"):
+        collection = db[name]
+        duplicates = collection.aggregate([
+            {"$sort": {"_id": 1}},
+            {"$group": {"_id": {field: f"${field}" for field in SUBMISSION_KEY},
+                        "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ], allowDiskUse=True)
+
+        extra = [_id for group in duplicates for _id in group['ids'][1:]]
+        for start in range(0, len(extra), BATCH_SIZE):
+            deleted += collection.delete_many({"_id": {"$in": extra[start:start + BATCH_SIZE]}}).deleted_count
+
+        for index in collection.index_information().values():
+            if index['key'] == keys and not index.get('unique'):
+                collection.drop_index(keys)
+        collection.create_indexes([IndexModel(keys, unique=True)])
+    return deleted
+
+
+if __name__ == '__main__':
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    updated, unscheduled = backfill_exam_windows(mongo.db)
+    print(f"✅ Backfilled start_at/end_at on {updated} exams ({unscheduled} unscheduled, set to today {DEFAULT_TIME})")
+    deleted = dedupe_submissions(mongo.db)
+    print(f"✅ Removed {deleted} duplicate results/submissions, (exam, student, attempt) now unique")
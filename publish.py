@@ -0,0 +1,117 @@
+# ---- publish.py ----
+# Publish an exam: resolve its exam_questions bridge rows and their overrides
+# against the question bank into one ordered snapshot, stored on the exam
+# document. Serving the exam is then a single read by _id (see exam_cache.py)
+# and later edits to the question bank do not change a published exam.
+# Run with: python publish.py <exam_id> [<exam_id> ...] | --all
+import argparse
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+# Bridge fields that override the question bank, and the bank field each replaces
+OVERRIDES = {
+    "question_text": ("question_text_override", "question"),
+    "marks": ("marks_override", "marks"),
+    "model_answer": ("model_answer_override", "model_answer"),
+    "rubric": ("rubric_override", "rubric"),
+}
+
+
+def snapshot_pipeline(exam_oid):
+    """Aggregation over exam_questions that yields the exam's ordered questions.
+
+    One $lookup against questions replaces a query per question; the
+    (exam, order_index) index serves the $match and $sort.
+    """
+    resolved = {
+        field: {"$ifNull": [f"${override}", f"$bank.{bank_field}"]}
+        for field, (override, bank_field) in OVERRIDES.items()
+    }
+    return [
+        {"$match": {"exam": exam_oid, "is_deleted": {"$ne": True}}},
+        {"$sort": {"order_index": 1}},
+        {"$lookup": {"from": "questions", "localField": "question", "foreignField": "_id", "as": "bank"}},
+        {"$unwind": "$bank"},
+        {"$project": {
+            "_id": 1,
+            "question": 1,
+            "order_index": 1,
+            "section": 1,
+            **resolved,
+            "options": {"$ifNull": ["$bank.options", []]},
+            "answer": {"$ifNull": ["$bank.answer", None]},
+        }},
+    ]
+
+
+def publish_exam(db, exam_oid, user=None):
+    """Snapshot an exam's questions onto the exam and its bridge rows.
+
+    The exam gets the ordered 'questions' array, 'total_marks' and a new
+    'version' (so cached definitions are replaced). Returns the number of
+    questions published.
+    """
+    if not db["exams"].find_one({"_id": exam_oid}, {"_id": 1}):
+        raise ValueError(f"Exam not found: {exam_oid}")
+
+    rows = list(db["exam_questions"].aggregate(snapshot_pipeline(exam_oid)))
+    if not rows:
+        raise ValueError(f"Exam {exam_oid} has no questions to publish")
+
+    now = datetime.now()
+    questions = []
+    ops = []
+    for row in rows:
+        snapshot = {key: value for key, value in row.items() if key != "_id"}
+        questions.append(snapshot)
+        # Freeze each bridge row too, so the published content stays auditable
+        ops.append(UpdateOne({"_id": row['_id']}, {"$set": {"snapshot": snapshot}}))
+    db["exam_questions"].bulk_write(ops, ordered=False)
+
+    db["exams"].update_one({"_id": exam_oid}, {
+        "$set": {
+            "questions": questions,
+            "total_marks": sum(q.get('marks') or 0 for q in questions),
+            "published_at": now,
+            "last_modification_time": now,
+            "last_modification_user_id": user,
+        },
+        "$inc": {"version": 1},
+    })
+    return len(questions)
+
+
+def publish_all(db, user=None, log=print):
+    """Publish every exam that has exam_questions rows."""
+    published = 0
+    for exam_oid in db["exam_questions"].distinct("exam"):
+        try:
+            count = publish_exam(db, exam_oid, user)
+        except ValueError as exc:
+            log(f"  skipped {exam_oid}: {exc}")
+            continue
+        log(f"  {exam_oid}: {count} questions")
+        published += 1
+    return published
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Snapshot exam questions onto their exams")
+    parser.add_argument("exam_ids", nargs="*")
+    parser.add_argument("--all", action="store_true", help="publish every exam with exam_questions")
+    args = parser.parse_args()
+    if not args.exam_ids and not args.all:
+        parser.error("give exam ids or --all")
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    if args.all:
+        print(f"✅ Published {publish_all(mongo.db)} exams")
+    else:
+        for exam_id in args.exam_ids:
+            count = publish_exam(mongo.db, ObjectId(exam_id))
+            print(f"✅ Published {exam_id} ({count} questions)")
@@ -0,0 +1,132 @@
+# ---- regrade.py ----
+# Rescore every submission of an exam against its current answer key.
+# Run with: python regrade.py <exam_id> [--batch-size N] [--restart]
+import argparse
+import time
+from datetime import datetime
+from itertools import islice
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from exam_cache import normalise_questions
+from grading import AnswerKey
+
+BATCH_SIZE = 1000
+CHECKPOINTS = "regrade_checkpoints"
+
+SUBMISSION_FIELDS = {"student": 1, "attempt": 1, "answers": 1}
+
+
+def batched(cursor, size):
+    """Yield lists of up to size documents from a cursor."""
+    while True:
+        batch = list(islice(cursor, size))
+        if not batch:
+            return
+        yield batch
+
+
+def submission_answers(db, batch, answer_key):
+    """Return one answers mapping (field -> value) per submission in the batch.
+
+    Submissions from submit_exam carry their answers inline; older ones keep
+    them in exam_answers, which are fetched with one query per batch and
+    mapped onto form fields through the key's question ids.
+    """
+    legacy_ids = [sub['_id'] for sub in batch if 'answers' not in sub]
+    stored = {}
+    if legacy_ids:
+        fields = {qid: field for qid, field in zip(answer_key.question_ids, answer_key.fields) if qid is not None}
+        cursor = db["exam_answers"].find(
+            {"submission": {"$in": legacy_ids}},
+            {"submission": 1, "question": 1, "answer": 1}
+        )
+        for answer in cursor:
+            field = fields.get(answer.get('question'))
+            if field:
+                stored.setdefault(answer['submission'], {})[field] = answer.get('answer')
+
+    return [sub.get('answers') or stored.get(sub['_id'], {}) for sub in batch]
+
+
+def regrade_exam(db, exam_oid, batch_size=BATCH_SIZE, resume=True, log=print):
+    """Rescore all submissions of an exam and bulk-update exam_results.
+
+    Progress is checkpointed after every batch; a later run resumes from the
+    last checkpoint unless the exam's version has changed since.
+    Returns (processed, submissions_per_second).
+    """
+    exam = db["exams"].find_one({"_id": exam_oid})
+    if not exam:
+        raise ValueError(f"Exam not found: {exam_oid}")
+
+    answer_key = AnswerKey(normalise_questions(exam))
+    if not answer_key.gradable:
+        raise ValueError("Exam has no auto-gradable questions")
+
+    version = exam.get('version', 0)
+    checkpoints = db[CHECKPOINTS]
+    checkpoint = checkpoints.find_one({"_id": exam_oid}) if resume else None
+    if checkpoint and checkpoint.get('version') != version:
+        log("Answer key changed since the checkpoint, starting over")
+        checkpoint = None
+
+    query = {"exam": exam_oid}
+    processed = 0
+    if checkpoint:
+        query["_id"] = {"$gt": checkpoint['last_submission']}
+        processed = checkpoint.get('processed', 0)
+        log(f"Resuming after {processed} submissions")
+
+    cursor = db["exam_submissions"].find(query, SUBMISSION_FIELDS).sort("_id", 1).batch_size(batch_size)
+    started = time.perf_counter()
+    done = 0
+
+    for batch in batched(cursor, batch_size):
+        scores = [answer_key.score(answers) for answers in submission_answers(db, batch, answer_key)]
+        now = datetime.now()
+
+        ops = [
+            UpdateOne(
+                {"exam": exam_oid, "student": sub['student'], "attempt": sub.get('attempt')},
+                {"$set": {"score": score, "total": answer_key.total, "regraded_at": now}},
+                upsert=True
+            )
+            for sub, score in zip(batch, scores)
+        ]
+        db["exam_results"].bulk_write(ops, ordered=False)
+
+        done += len(batch)
+        processed += len(batch)
+        checkpoints.update_one(
+            {"_id": exam_oid},
+            {"$set": {"last_submission": batch[-1]['_id'], "processed": processed, "version": version, "updated_at": now}},
+            upsert=True
+        )
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        log(f"  {processed} submissions regraded ({rate:,.0f}/s)")
+
+    checkpoints.delete_one({"_id": exam_oid})
+    rate = done / max(time.perf_counter() - started, 1e-9)
+    return processed, rate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Regrade an exam against its current answer key")
+    parser.add_argument("exam_id")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    processed, rate = regrade_exam(mongo.db, ObjectId(args.exam_id), args.batch_size, resume=not args.restart)
+    print(f"✅ Regraded {processed} submissions ({rate:,.0f} submissions/s)")
+
+    # Scores moved: rebuild the exam's statistics to match
+    from stats import recompute_exam_stats
+    recompute_exam_stats(mongo.db, ObjectId(args.exam_id), args.batch_size)
+    print("✅ Exam statistics recomputed")
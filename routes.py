@@ -1,128 +1,483 @@
-from flask import render_template, request
-from app import app, db
-from datetime import datetime, timedelta
+import os
+import queue
+import threading
+
+from flask import Response, current_app, jsonify, render_template, request, session, stream_with_context
+from itsdangerous import BadSignature, URLSafeSerializer
+from jinja2 import TemplateNotFound
+from datetime import datetime
 from bson.objectid import ObjectId
+from admission import IN_LINE_PAGE, TICKET_HEADER, Admission
+from drafts import DraftBuffer
+from events import KEEPALIVE, ExamEventHub, QueueSubscriber, format_sse
+from exam_api import FORMATS, JSON, MSGPACK, ContentCache, encode
+from exam_cache import ExamCache
+from export import EXPORTS, RowCounter, csv_chunks, iter_rows
+from extensions import mongo
+from fragments import FRAGMENT_TEMPLATE, FragmentCache
+from dal import ExamStore
+from listing import STATUSES
+from submission_queue import SubmissionJournal, WriteBehindWriter, idempotency_key
+from timer import TimerService
+from views import STUDENT_ID, dashboard_exam, exam_page, form_answers, grade_submission
+
+# -------------------------------------------------------------
+# Per-app, per-process helpers in app.extensions, created on first use so
+# that each app gets its own config and nothing (threads, sockets, SQLite
+# handles) is inherited across a pre-fork
+# -------------------------------------------------------------
+_services_lock = threading.RLock()
+
+def _service(name, factory):
+    with _services_lock:
+        services = current_app.extensions.get('exam_services')
+        if services is None or services['pid'] != os.getpid():
+            services = current_app.extensions['exam_services'] = {'pid': os.getpid()}
+        if name not in services:
+            services[name] = factory()
+        return services[name]
+
+def store():
+    """Data access with read-replica routing (see dal.py)."""
+    return _service('store', lambda: ExamStore(mongo.db, current_app.config))
+
+def exam_cache():
+    """Parsed exam definitions shared by start_exam and submit_exam."""
+    def create():
+        cache = ExamCache()
+        cache.watch(store().exam_definitions)
+        return cache
+    return _service('exam_cache', create)
+
+def fragment_cache():
+    """Question bodies rendered once per exam version (see fragments.py)."""
+    return _service('fragments', lambda: FragmentCache(directory=current_app.config['FRAGMENT_CACHE_DIR']))
+
+def questions_fragment(definition):
+    """The cached question body, or None when the site has no exam_questions.html."""
+    try:
+        return fragment_cache().get(
+            definition, lambda: render_template(FRAGMENT_TEMPLATE, questions=definition.questions)
+        )
+    except TemplateNotFound:
+        return None
+
+def content_cache():
+    """Encoded exam content for the API, once per exam version (see exam_api.py)."""
+    return _service('content', ContentCache)
+
+def api_format():
+    """MessagePack when asked for (?format=msgpack or Accept), else JSON."""
+    if request.args.get('format') == "msgpack":
+        return MSGPACK
+    return request.accept_mimetypes.best_match(FORMATS, default=JSON)
+
+def draft_buffer():
+    """Autosaved answers, coalesced in memory and flushed to exam_drafts."""
+    return _service('drafts', lambda: DraftBuffer(store().exam_drafts))
+
+def submission_writer():
+    """Write-behind submissions (config WRITE_BEHIND)."""
+    journal_path = current_app.config['WRITE_BEHIND_JOURNAL']
+    return _service('writer', lambda: WriteBehindWriter(SubmissionJournal(journal_path), mongo.db).start())
 
-exams_collection = db["exams"]
-exam_results_collection = db["exam_results"]
+def timer_service():
+    """Per-student deadlines; auto-submits from the draft at expiry."""
+    app = current_app._get_current_object()
+    def create():
+        service = TimerService(mongo.db, on_expire=lambda exam, student: auto_submit(app, exam, student))
+        service.load()
+        return service.run()
+    return _service('timer', create)
 
-STUDENT_ID = "S-CAROL"  # Dummy student ID for demo
+def auto_submit(app, exam, student):
+    """Grade and record whatever the student autosaved when their time ran out."""
+    with app.app_context():
+        definition = get_exam(exam)
+        if not definition:
+            return
+        answers = draft_buffer().load(exam, student) or {}
+        result, submission = grade_submission(definition, student, answers, datetime.now())
+        result['status'] = "AUTO_SUBMITTED"
+        store().record_submission(result, submission)
+        draft_buffer().forget(exam, student)
+
+def admission():
+    """Per-exam start admission (see admission.py)."""
+    return _service('admission', lambda: Admission(current_app.config['ADMISSION_RATE'],
+                                                   current_app.config['ADMISSION_BURST']))
+
+def ticket_serializer():
+    """Signs line tickets handed to the client, so nobody can claim another's place."""
+    return URLSafeSerializer(current_app.secret_key, salt="admission-ticket")
+
+def returned_ticket(key):
+    """The ticket for exam key passed back as ?ticket=, or None if absent or not ours."""
+    token = request.args.get('ticket')
+    if not token:
+        return None
+    try:
+        exam, ticket = ticket_serializer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return ticket if exam == key else None
+
+def admit_candidate(oid, api=False):
+    """None when the candidate may open the exam, else the light "you're in line" 429 response.
+
+    The admitted exams and the place in line are kept in the session cookie,
+    so an admitted candidate is never queued again. The signed ticket is
+    also sent with Retry-After (JSON body and X-Admission-Ticket header) and
+    accepted back as ?ticket=, for clients that do not keep cookies.
+    """
+    key = str(oid)
+    admitted = session.get('admitted', [])
+    if key in admitted:
+        return None
+
+    tickets = session.get('tickets', {})
+    held = tickets.pop(key, None)
+    ok, ticket, position, retry_after = admission().admit(oid, returned_ticket(key) or held)
+    if ok:
+        session['admitted'] = admitted + [key]
+        session['tickets'] = tickets
+        return None
+    session['tickets'] = {**tickets, key: ticket}
+    token = ticket_serializer().dumps([key, ticket])
+
+    if api or request.accept_mimetypes.best == "application/json":
+        response = jsonify(status="waiting", position=position, retry_after=retry_after, ticket=token)
+    else:
+        response = Response(IN_LINE_PAGE.format(position=position, retry_after=retry_after, ticket=token),
+                            mimetype="text/html")
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    response.headers[TICKET_HEADER] = token
+    response.cache_control.no_store = True
+    return response
+
+def event_hub():
+    """Live exam events, one watcher per exam shared by all open streams."""
+    return _service('events', lambda: ExamEventHub(mongo.db))
+
+def get_exam(oid):
+    return exam_cache().get(store().exam_definitions, oid)
 
 # Dashboard route
-@app.route('/')
 def dashboard():
-    exams = list(exams_collection.find())
+    exam_store = store()
     now = datetime.now()
+    cursor = request.args.get('cursor')
 
-    for exam in exams:
-        exam['_id'] = str(exam['_id'])
-
-        # Use exam_date and exam_time from seed.py or defaults
-        exam_date_str = exam.get('exam_date', now.strftime('%Y-%m-%d'))
-        exam_time_str = exam.get('exam_time', '09:00')
-
-        # Create a schedule dict for template
-        exam['schedule'] = {
-            "date": exam_date_str,
-            "time": exam_time_str
-        }
+    # One status tab per page; without one, show the first page of each
+    status = request.args.get('status')
+    statuses = [status] if status in STATUSES else list(STATUSES)
 
-        # Convert to datetime objects
-        exam_start = datetime.strptime(f"{exam_date_str} {exam_time_str}", "%Y-%m-%d %H:%M")
-        exam_end = exam_start + timedelta(minutes=exam.get('duration', 60))
+    # Only the exams this student sits or is enrolled for
+    scope = exam_store.student_scope(STUDENT_ID)
 
-        exam['start_time'] = exam_start   # datetime object
-        exam['end_time'] = exam_end       # datetime object
+    exams = []
+    next_cursors = {}
+    for exam_status in statuses:
+        try:
+            page, next_cursor = exam_store.dashboard_page(exam_status, now,
+                                                          cursor=cursor if status else None, scope=scope)
+        except ValueError:
+            return "Invalid page cursor"
 
-        # Determine status
-        if exam_start <= now <= exam_end:
-            exam['status'] = "Active"
-        elif now < exam_start:
-            exam['status'] = "Upcoming"
-        else:
-            exam['status'] = "Ended"
+        exams.extend(dashboard_exam(exam, exam_status) for exam in page)
+        next_cursors[exam_status] = next_cursor
 
-    return render_template('student_exam.html', exams=exams)
+    return render_template('student_exam.html', exams=exams, status=status, next_cursors=next_cursors)
 
 # Start exam route
-@app.route('/exam/<exam_id>')
 def start_exam(exam_id):
     try:
         oid = ObjectId(exam_id)
     except Exception:
         return "Invalid exam ID"
 
-    exam_doc = exams_collection.find_one({"_id": oid})
-    if not exam_doc:
+    definition = get_exam(oid)
+    if not definition:
         return "Exam not found!"
 
-    now = datetime.now()
-    exam_doc['_id'] = str(exam_doc['_id'])
-
-    # Use exam_date and exam_time from seed.py or defaults
-    exam_date_str = exam_doc.get('exam_date', now.strftime('%Y-%m-%d'))
-    exam_time_str = exam_doc.get('exam_time', '09:00')
-
-    # Schedule dict for template
-    exam_doc['schedule'] = {
-        "date": exam_date_str,
-        "time": exam_time_str
-    }
+    # At the start time the whole cohort arrives at once: admit at a steady rate
+    if current_app.config['ADMISSION_RATE']:
+        waiting = admit_candidate(oid)
+        if waiting is not None:
+            return waiting
 
-    # Convert to datetime objects
-    exam_start = datetime.strptime(f"{exam_date_str} {exam_time_str}", "%Y-%m-%d %H:%M")
-    # Support duration keys 'duration_minutes' or 'duration' in DB
-    duration_minutes = int(exam_doc.get('duration_minutes', exam_doc.get('duration', 60)))
-    # Expose both keys for template compatibility
-    exam_doc['duration_minutes'] = duration_minutes
-    exam_doc['duration'] = duration_minutes
-    exam_end = exam_start + timedelta(minutes=duration_minutes)
+    # The student's deadline is fixed on first open; none once the exam has ended (see timer.py)
+    timers = timer_service()
+    timer = timers.status(timers.start(definition, STUDENT_ID))
 
-    exam_doc['start_time'] = exam_start
-    exam_doc['end_time'] = exam_end
+    # Shared question body from the fragment cache; only the timer and the
+    # student's saved answers are rendered here. Without the fragment
+    # template the page renders the questions itself, as before.
+    fragment = questions_fragment(definition)
+    exam_doc = exam_page(definition, datetime.now(), timer, questions=fragment is None)
+    return render_template('start_exam.html', exam=exam_doc,
+                           questions_html=fragment.html if fragment else None,
+                           answers=draft_buffer().load(oid, STUDENT_ID) or {})
 
-    # Compute remaining seconds for timer; ensure non-negative integer
-    remaining_seconds = int((exam_end - now).total_seconds())
-    exam_doc['remaining_seconds'] = max(0, remaining_seconds)
+# Question body alone, with validators: a reload mid-exam gets a 304
+def exam_questions(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return "Invalid exam ID", 400
 
-    # Dummy questions if none in DB (replace with real questions)
-    exam_doc['questions'] = exam_doc.get('questions', [
-        {"question_text": "Sample Q1", "options": ["A", "B", "C"], "answer": "A"},
-        {"question_text": "Sample Q2", "options": ["True", "False"], "answer": "True"}
-    ])
+    definition = get_exam(oid)
+    if not definition:
+        return "Exam not found!", 404
 
-    return render_template('start_exam.html', exam=exam_doc)
+    fragment = questions_fragment(definition)
+    if fragment is None:
+        return "Question body not available", 404
+    response = Response(fragment.html, mimetype="text/html")
+    response.set_etag(fragment.etag)
+    response.last_modified = fragment.last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True   # revalidate, then reuse
+    return response.make_conditional(request)
 
 # Submit exam route
-@app.route('/exam/<exam_id>/submit', methods=['POST'])
 def submit_exam(exam_id):
     try:
         oid = ObjectId(exam_id)
     except Exception:
         return "Invalid exam ID"
 
-    exam = exams_collection.find_one({"_id": oid})
-    if not exam:
+    definition = get_exam(oid)
+    if not definition:
         return "Exam not found!"
 
     now = datetime.now()
-    score = 0
-    total = len(exam.get('questions', []))
-
-    for idx, q in enumerate(exam.get('questions', []), start=1):
-        submitted = request.form.get(f'q{idx}')
-        correct = q.get('answer')
-        if submitted is not None and str(submitted).strip() == str(correct).strip():
-            score += 1
-
-    # Save result
-    exam_results_collection.insert_one({
-        "exam": oid,
-        "student": STUDENT_ID,
-        "score": score,
-        "total": total,
-        "submitted_at": now,
-        "status": "SUBMITTED"
-    })
-
-    return render_template('exam_result.html', score=score, total=total)
+    attempt = 1     # one attempt per exam
+    key = idempotency_key(oid, STUDENT_ID, attempt)
+
+    if current_app.config['WRITE_BEHIND']:
+        # No MongoDB round trip here: duplicates are found in the journal,
+        # the draft is this process's copy and the writer stops the timer
+        writer = submission_writer()
+        stored = writer.journaled(key)
+        if stored:
+            return render_template('exam_result.html', score=stored['score'], total=stored['total'])
+
+        drafts = draft_buffer()
+        answers = {**drafts.local(oid, STUDENT_ID), **form_answers(definition.answer_key, request.form)}
+        result, submission = grade_submission(definition, STUDENT_ID, answers, now, attempt)
+        result = writer.submit(key, result, submission)
+        timer_service().complete(oid, STUDENT_ID, write=False)
+        drafts.forget(oid, STUDENT_ID)
+        return render_template('exam_result.html', score=result['score'], total=result['total'])
+
+    # A duplicate submit (double click, client retry) gets the stored result, ungraded
+    stored = store().stored_result(oid, STUDENT_ID, attempt)
+    if stored:
+        return render_template('exam_result.html', score=stored['score'], total=stored['total'])
+
+    # The submitted form wins; the autosaved draft fills in what it lacks
+    draft = draft_buffer().load(oid, STUDENT_ID) or {}
+    answers = {**draft, **form_answers(definition.answer_key, request.form)}
+
+    result, submission = grade_submission(definition, STUDENT_ID, answers, now, attempt)
+    timer_service().complete(oid, STUDENT_ID)
+    draft_buffer().forget(oid, STUDENT_ID)
+
+    # Save submission and result; a concurrent duplicate may have won
+    result, _ = store().record_submission(result, submission)
+
+    return render_template('exam_result.html', score=result['score'], total=result['total'])
+
+# Exam content API: the question snapshot, encoded once per exam version.
+# The ETag is the content hash, so a client that has it gets a 304.
+def exam_content_api(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    definition = get_exam(oid)
+    if not definition:
+        return jsonify(error="Exam not found"), 404
+
+    content = content_cache().get(definition)
+    mimetype = api_format()
+    try:
+        response = Response(content.body(mimetype), mimetype=mimetype)
+    except RuntimeError as exc:
+        return jsonify(error=str(exc)), 406
+    response.set_etag(content.etag(mimetype))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True   # revalidate, then reuse
+    return response.make_conditional(request)
+
+# Exam state API: what changes during a sitting. Opening it starts the timer
+# like start_exam; saved answers only with ?answers=1 (a DB read), e.g. for
+# a client that lost its local copy.
+def exam_state_api(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    definition = get_exam(oid)
+    if not definition:
+        return jsonify(error="Exam not found"), 404
+
+    if current_app.config['ADMISSION_RATE']:
+        waiting = admit_candidate(oid, api=True)
+        if waiting is not None:
+            return waiting
+
+    timers = timer_service()
+    timer = timers.status(timers.start(definition, STUDENT_ID))
+    state = {
+        "exam": exam_id,
+        "version": definition.version,
+        "hash": content_cache().get(definition).hash,
+        "status": timer['status'],
+        "remaining_seconds": timer['remaining_seconds'],
+        "deadline": timer['deadline'].isoformat(),
+        "paused": timer['paused'],
+    }
+    if request.args.get('answers'):
+        state["answers"] = draft_buffer().load(oid, STUDENT_ID) or {}
+
+    mimetype = api_format()
+    try:
+        response = Response(encode(state, mimetype), mimetype=mimetype)
+    except RuntimeError as exc:
+        return jsonify(error=str(exc)), 406
+    response.cache_control.no_store = True
+    return response
+
+# Result route (read from the primary: a student must see their own submit)
+def exam_result(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return "Invalid exam ID"
+
+    result = store().latest_result(oid, STUDENT_ID)
+    if not result:
+        return "No result yet!"
+
+    return render_template('exam_result.html', score=result['score'], total=result['total'])
+
+# Timer status route, cheap enough to poll: no DB read while the timer is cached
+def exam_remaining(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    timer = timer_service().remaining(oid, STUDENT_ID)
+    if timer is None:
+        return jsonify(error="Exam not started"), 404
+
+    timer['deadline'] = timer['deadline'].isoformat()
+    return jsonify(timer)
+
+# Live events route (Server-Sent Events): pause/resume, chat, time extensions
+def exam_events(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    # No watcher thread for exams that don't exist
+    if not get_exam(oid):
+        return jsonify(error="Exam not found!"), 404
+
+    hub = event_hub()
+    subscriber = hub.subscribe(oid, QueueSubscriber(STUDENT_ID))
+
+    def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield format_sse(subscriber.queue.get(timeout=KEEPALIVE))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            hub.unsubscribe(oid, subscriber)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Autosave route: only the changed answers, e.g. {"q3": "B"}
+def autosave_exam(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    definition = get_exam(oid)
+    if not definition:
+        return jsonify(error="Exam not found!"), 404
+
+    changes = request.get_json(silent=True) or request.form.to_dict()
+    fields = set(definition.answer_key.fields)
+    if not isinstance(changes, dict) or not set(changes) <= fields:
+        return jsonify(error="Unknown question fields"), 400
+
+    saved = draft_buffer().save(oid, STUDENT_ID, {field: str(value) for field, value in changes.items()})
+    return jsonify(saved=saved)
+
+# Semester export as CSV, streamed in chunks straight off the cursor
+def export_results(kind):
+    semester = request.args.get('semester')
+    if kind not in EXPORTS or not semester:
+        return jsonify(error="Unknown export or missing semester"), 400
+    try:
+        rows = RowCounter(iter_rows(mongo.db, kind, semester))
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 404
+
+    logger = current_app.logger
+
+    def stream():
+        yield from csv_chunks(rows, EXPORTS[kind][1])
+        logger.info("Exported %d %s rows (%.0f rows/s)", rows.count, kind, rows.rate())
+
+    filename = f"{kind}-{semester}.csv"
+    return Response(stream(), mimetype="text/csv",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# Exam statistics: one _id lookup in exam_stats, maintained on submit
+def exam_stats(exam_id):
+    try:
+        oid = ObjectId(exam_id)
+    except Exception:
+        return jsonify(error="Invalid exam ID"), 400
+
+    summary = store().exam_stats.get(oid)
+    if summary is None:
+        return jsonify(error="No submissions yet"), 404
+    return jsonify(summary)
+
+# Exam and fragment cache counters, and the admission lines when enabled
+def cache_stats():
+    stats = {**exam_cache().stats(), "fragments": fragment_cache().stats(), "content": content_cache().stats()}
+    if current_app.config['ADMISSION_RATE']:
+        stats["admission"] = admission().stats()
+    return jsonify(stats)
+
+def init_app(app):
+    """Register the routes (endpoint names match the view functions)."""
+    app.add_url_rule('/', view_func=dashboard)
+    app.add_url_rule('/exam/<exam_id>', view_func=start_exam)
+    app.add_url_rule('/exam/<exam_id>/submit', view_func=submit_exam, methods=['POST'])
+    app.add_url_rule('/exam/<exam_id>/result', view_func=exam_result)
+    app.add_url_rule('/exam/<exam_id>/questions', view_func=exam_questions)
+    app.add_url_rule('/exam/<exam_id>/remaining', view_func=exam_remaining)
+    app.add_url_rule('/exam/<exam_id>/events', view_func=exam_events)
+    app.add_url_rule('/exam/<exam_id>/autosave', view_func=autosave_exam, methods=['POST'])
+    app.add_url_rule('/exam/<exam_id>/stats', view_func=exam_stats)
+    app.add_url_rule('/api/exam/<exam_id>/content', view_func=exam_content_api)
+    app.add_url_rule('/api/exam/<exam_id>/state', view_func=exam_state_api)
+    app.add_url_rule('/export/<kind>.csv', view_func=export_results)
+    app.add_url_rule('/cache/stats', view_func=cache_stats)
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M"
+DEFAULT_TIME = "09:00"
+
+
+def exam_duration(exam):
+    """Return the exam duration in minutes ('duration_minutes' or 'duration')."""
+    return int(exam.get('duration_minutes', exam.get('duration', 60)))
+
+
+def parse_exam_window(exam, schedule=None):
+    """Build (start_at, end_at) from the string date/time fields of an exam.
+
+    Falls back to the matching exam_schedules document when the exam itself
+    has no date. Returns (None, None) when no date can be found.
+    """
+    date_str = exam.get('exam_date')
+    time_str = exam.get('exam_time') or exam.get('exam_start_time')
+
+    if not date_str and schedule and schedule.get('date'):
+        date_str = schedule['date'].strftime(DATE_FORMAT)
+        time_str = time_str or schedule.get('time')
+    if not date_str:
+        return None, None
+
+    start_at = datetime.strptime(f"{date_str} {time_str or DEFAULT_TIME}", f"{DATE_FORMAT} {TIME_FORMAT}")
+    if exam.get('exam_end_time'):
+        end_at = datetime.strptime(f"{date_str} {exam['exam_end_time']}", f"{DATE_FORMAT} {TIME_FORMAT}")
+    else:
+        end_at = start_at + timedelta(minutes=exam_duration(exam))
+    return start_at, end_at
+
+
+def exam_window(exam, now=None):
+    """Return (start_at, end_at) for an exam, preferring the stored datetimes."""
+    if exam.get('start_at') and exam.get('end_at'):
+        return exam['start_at'], exam['end_at']
+
+    start_at, end_at = parse_exam_window(exam)
+    if start_at is None:
+        # Unscheduled exams default to today at 09:00
+        now = now or datetime.now()
+        start_at, end_at = parse_exam_window({**exam, 'exam_date': now.strftime(DATE_FORMAT)})
+    return start_at, end_at
+
+
+def exam_status(start_at, end_at, now=None):
+    """Return exam status: Upcoming, Active, or Ended"""
+    now = now or datetime.now()
+    if now < start_at:
+        return "Upcoming"
+    elif start_at <= now <= end_at:
+        return "Active"
+    else:
+        return "Ended"
@@ -2,6 +2,10 @@
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 from bson import ObjectId
+from audit import audit
+from indexes import create_indexes
+from migrations import backfill_exam_windows
+from publish import publish_all
 
 client = MongoClient("mongodb://localhost:27017/")
 
@@ -56,17 +60,6 @@ all_colls = [
 for c in all_colls:
     c.delete_many({})
 
-# Helper for audit fields
-def audit(user_id=1, created=None):
-    now = datetime.now() if created is None else created
-    return {
-        "last_modification_user_id": user_id,
-        "last_modification_time": now,
-        "creation_time": now,
-        "is_active": True,
-        "is_deleted": False
-    }
-
 # --- Core Users (base class) ---
 user_docs = [
     {
@@ -771,39 +764,15 @@ incidents.insert_one({
     **audit(user_ids[2])
 })
 
-# ---- Recommended indexes (run once) ----
-# Users
-users.create_index("email", unique=True)
-users.create_index("role")
-
-# Courses
-courses.create_index([("name", 1)])
-
-# Open-ended questions (for exams)
-questions.create_index([("course", 1), ("educator", 1)])
-
-# Exam runtime data
-exam_schedules.create_index([("exam", 1)])
-exam_students.create_index([("exam", 1), ("student", 1)])
-exam_results.create_index([("exam", 1), ("student", 1)])
-invigilators.create_index([("exam_schedule", 1)])
-
-# Student semester records (GPA/CGPA history)
-student_semester_records.create_index([("student", 1), ("academic_semester", 1)], unique=True)
-student_semester_records.create_index([("status", 1)])
-student_semester_records.create_index([("student", 1), ("finalized_date", -1)])
+# ---- Recommended indexes (see indexes.py) ----
+create_indexes(db)
 
-# Course results (final course grades)
-course_results.create_index([("student", 1), ("course", 1), ("academic_semester", 1)], unique=True)
-course_results.create_index([("course", 1), ("academic_semester", 1), ("status", 1)])
-course_results.create_index([("student", 1), ("academic_semester", 1)])
-course_results.create_index([("status", 1)])
+# Precompute start_at/end_at for the dashboard
+backfill_exam_windows(db)
 
-# Academic semesters
-semesters.create_index([("semester_code", 1)], unique=True)
-semesters.create_index([("status", 1)])
-semesters.create_index([("start_date", 1)])
+# Snapshot exam_questions onto their exams (one read per exam to serve)
+publish_all(db)
 
 print("\n✅ Done seeding database!")
 print(f"\n📝 Sample Educator ID (use this in exam.html): {educator_ids[0]}")
-print(f"📝 Sample Exam ID: {exam_id_with_qset}")
\ No newline at end of file
+print(f"📝 Sample Exam ID: {exam_id_with_qset}")
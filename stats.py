@@ -0,0 +1,194 @@
+# ---- stats.py ----
+# Per-exam score statistics in exam_stats: count, mean, standard deviation,
+# a fixed-bin histogram, percentiles and per-question difficulty and
+# discrimination. Every submission adds itself with one $inc-only upsert; a
+# vectorized full recompute (finalisation, after a regrade) replaces the
+# document from the stored submissions.
+# Run with: python stats.py <exam_id>
+import argparse
+import math
+from datetime import datetime
+
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from exam_cache import normalise_questions
+from grading import AnswerKey
+from regrade import BATCH_SIZE, SUBMISSION_FIELDS, batched, submission_answers
+
+STATS = "exam_stats"
+BINS = 10                       # histogram bins over 0-100% of the total
+PERCENTILES = (25, 50, 75, 90)
+
+
+def score_bin(score, total):
+    if not total:
+        return 0
+    return min(max(int(score / total * BINS), 0), BINS - 1)
+
+
+def stats_update(result, now=None):
+    """(filter, update) adding one graded result to its exam's statistics.
+
+    Only sums are stored (count, sum, sum of squares, per-question correct
+    counts and the score sum of those who got it right), so concurrent
+    submissions never conflict and the derived figures are computed on read.
+    """
+    score, total = result['score'], result['total']
+    inc = {"count": 1, "sum": score, "sum_sq": score * score, f"histogram.{score_bin(score, total)}": 1}
+    for field in result.get('correct') or ():
+        inc[f"items.{field}.correct"] = 1
+        inc[f"items.{field}.score_sum"] = score
+    return {"_id": result['exam']}, {
+        "$inc": inc,
+        "$min": {"min": score},
+        "$max": {"max": score},
+        "$set": {"total": total, "updated_at": now or datetime.now()},
+    }
+
+
+class ExamStats:
+    """exam_stats reads and incremental writes."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def record(self, results):
+        """Add newly stored results (each once) to their exams' statistics."""
+        ops = [UpdateOne(*stats_update(result), upsert=True) for result in results]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    def get(self, exam):
+        """Summary for one exam (a single _id lookup), or None."""
+        doc = self.collection.find_one({"_id": exam})
+        return summarise(doc) if doc else None
+
+
+def summarise(doc):
+    """Derived statistics from a stored exam_stats document."""
+    n = doc.get('count', 0)
+    total = doc.get('total') or 0
+    mean = doc.get('sum', 0) / n if n else 0.0
+    std = math.sqrt(max(doc.get('sum_sq', 0) / n - mean * mean, 0.0)) if n else 0.0
+    histogram = [doc.get('histogram', {}).get(str(b), 0) for b in range(BINS)]
+
+    if doc.get('percentiles') and doc.get('percentiles_count') == n:
+        percentiles = doc['percentiles']            # exact, from the last recompute
+    else:
+        percentiles = {str(p): histogram_percentile(histogram, total, p) for p in PERCENTILES}
+
+    items = {}
+    for field, item in sorted(doc.get('items', {}).items(), key=lambda kv: (len(kv[0]), kv[0])):
+        correct = item.get('correct', 0)
+        p = correct / n if n else 0.0
+        discrimination = None
+        if 0 < correct < n and std > 0:
+            # Point-biserial correlation between this item and the total score
+            mean_right = item.get('score_sum', 0) / correct
+            mean_wrong = (doc.get('sum', 0) - item.get('score_sum', 0)) / (n - correct)
+            discrimination = round((mean_right - mean_wrong) / std * math.sqrt(p * (1 - p)), 4)
+        items[field] = {"correct": correct, "difficulty": round(p, 4), "discrimination": discrimination}
+
+    return {
+        "exam": str(doc['_id']),
+        "count": n,
+        "total": total,
+        "mean": round(mean, 4),
+        "std": round(std, 4),
+        "min": doc.get('min'),
+        "max": doc.get('max'),
+        "histogram": histogram,
+        "percentiles": percentiles,
+        "items": items,
+        "updated_at": doc.get('updated_at'),
+    }
+
+
+def histogram_percentile(histogram, total, pct):
+    """Estimate a percentile by linear interpolation within the histogram bins."""
+    n = sum(histogram)
+    if not n or not total:
+        return None
+    target = n * pct / 100
+    width = total / BINS
+    seen = 0
+    for b, count in enumerate(histogram):
+        if count and seen + count >= target:
+            return round((b + (target - seen) / count) * width, 4)
+        seen += count
+    return total
+
+
+# -------------------------------------------------------------
+# Full recompute
+# -------------------------------------------------------------
+def recompute_exam_stats(db, exam_oid, batch_size=BATCH_SIZE):
+    """Rebuild an exam's statistics from its submissions with NumPy.
+
+    Scores and per-question correctness come from the current answer key, so
+    this also brings the statistics in line after a regrade. Returns the
+    summary.
+    """
+    exam = db["exams"].find_one({"_id": exam_oid})
+    if not exam:
+        raise ValueError(f"Exam not found: {exam_oid}")
+    answer_key = AnswerKey(normalise_questions(exam))
+    fields = answer_key.gradable_fields
+    total = answer_key.total
+
+    scores = []
+    correct = np.zeros(len(fields), dtype=np.int64)
+    score_sum = np.zeros(len(fields))
+    cursor = db["exam_submissions"].find({"exam": exam_oid}, SUBMISSION_FIELDS).batch_size(batch_size)
+    for batch in batched(cursor, batch_size):
+        answers = submission_answers(db, batch, answer_key)
+        if fields:
+            # One grading pass: scores are the correct answers' marks
+            matrix = answer_key.correct_matrix(answers)
+            batch_scores = (matrix @ answer_key.marks_array).astype(float)
+            correct += matrix.sum(axis=0)
+            score_sum += batch_scores @ matrix
+        else:
+            batch_scores = np.zeros(len(answers))
+        scores.append(batch_scores)
+
+    scores = np.concatenate(scores) if scores else np.zeros(0)
+    n = len(scores)
+    bins = np.minimum((scores / total * BINS).astype(int), BINS - 1) if total else np.zeros(n, dtype=int)
+    histogram = np.bincount(np.maximum(bins, 0), minlength=BINS)
+
+    doc = {
+        "_id": exam_oid,
+        "count": n,
+        "sum": float(scores.sum()),
+        "sum_sq": float((scores * scores).sum()),
+        "min": float(scores.min()) if n else None,
+        "max": float(scores.max()) if n else None,
+        "total": total,
+        "histogram": {str(b): int(c) for b, c in enumerate(histogram) if c},
+        "items": {field: {"correct": int(c), "score_sum": float(s)} for field, c, s in zip(fields, correct, score_sum)},
+        "percentiles": ({str(p): round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(scores, PERCENTILES))}
+                        if n else None),
+        "percentiles_count": n,
+        "version": exam.get('version', 0),
+        "updated_at": datetime.now(),
+    }
+    db[STATS].replace_one({"_id": exam_oid}, doc, upsert=True)
+    return summarise(doc)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute an exam's statistics from its submissions")
+    parser.add_argument("exam_id")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import mongo
+
+    create_app()
+    summary = recompute_exam_stats(mongo.db, ObjectId(args.exam_id), args.batch_size)
+    print(f"✅ {summary['count']} submissions: mean {summary['mean']}, std {summary['std']}, "
+          f"median {summary['percentiles'] and summary['percentiles'].get('50')}")
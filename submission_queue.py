@@ -0,0 +1,230 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from stats import STATS, ExamStats
+from timer import RUNNING, SUBMITTED
+
+log = logging.getLogger(__name__)
+
+FLUSH_BATCH = 500
+FLUSH_INTERVAL = 0.5   # seconds between flushes when idle
+MAX_BACKOFF = 30       # seconds between retries after repeated flush failures
+FLUSHED_TTL = 24 * 3600   # seconds a flushed result is kept to answer duplicate submits
+PRUNE_INTERVAL = 60       # seconds between prunes of expired flushed rows
+DUPLICATE_KEY = 11000
+
+
+# Unique key of exam_results and exam_submissions (see indexes.py)
+SUBMISSION_KEY = ("exam", "student", "attempt")
+
+
+def idempotency_key(exam, student, attempt):
+    """Identity of one submission: (exam, student, attempt)."""
+    return f"{exam}:{student}:{attempt}"
+
+
+def submission_key(doc):
+    """The (exam, student, attempt) filter of a result or submission document."""
+    return {field: doc.get(field) for field in SUBMISSION_KEY}
+
+
+def bulk_upsert(collection, ops):
+    """Unordered bulk upserts; returns the indexes of the ops that inserted.
+
+    Duplicate-key errors mean a concurrent writer stored that key first,
+    which is the outcome the $setOnInsert upsert wants anyway.
+    """
+    try:
+        return collection.bulk_write(ops, ordered=False).upserted_ids
+    except BulkWriteError as exc:
+        details = exc.details
+        if details.get('writeConcernErrors') or any(e['code'] != DUPLICATE_KEY for e in details['writeErrors']):
+            raise
+        return {u['index']: u['_id'] for u in details['upserted']}
+
+
+class SubmissionJournal:
+    """Durable SQLite journal of graded submissions awaiting MongoDB.
+
+    Rows are written before the request returns and marked flushed once
+    MongoDB has acknowledged them, so a crash loses nothing: pending rows
+    are replayed when the writer starts again. Flushed rows stay until they
+    are older than the TTL, so every worker sharing the journal, and a
+    restarted one, answers a duplicate submit with the stored result.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: an acknowledged submit survives power loss, not just a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT UNIQUE NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " flushed_at REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(journal)")]
+        if "flushed_at" not in columns:
+            self._conn.execute("ALTER TABLE journal ADD COLUMN flushed_at REAL")   # journal from an older release
+        self._conn.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal (id) WHERE flushed_at IS NULL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS journal_flushed ON journal (flushed_at) WHERE flushed_at IS NOT NULL")
+        self._lock = threading.Lock()
+
+    def append(self, key, payload):
+        """Journal a submission; returns False if the key was already journaled."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO journal (key, payload) VALUES (?, ?)",
+                (key, json_util.dumps(payload))
+            )
+        return cursor.rowcount == 1
+
+    def get(self, key):
+        """The journaled payload for a key, pending or flushed, or None (never journaled or pruned)."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM journal WHERE key = ?", (key,)).fetchone()
+        return json_util.loads(row[0]) if row else None
+
+    def pending(self, limit=FLUSH_BATCH):
+        """Return up to limit journaled (id, payload) rows, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM journal WHERE flushed_at IS NULL ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, json_util.loads(payload)) for row_id, payload in rows]
+
+    def mark_flushed(self, ids):
+        """Mark rows MongoDB has acknowledged; they are no longer pending."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE journal SET flushed_at = ? WHERE id = ?", [(now, i) for i in ids])
+
+    def prune(self, ttl=FLUSHED_TTL):
+        """Drop rows flushed more than ttl seconds ago; returns how many."""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM journal WHERE flushed_at < ?", (time.time() - ttl,)
+            ).rowcount
+
+    def backlog(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM journal WHERE flushed_at IS NULL").fetchone()[0]
+
+
+class WriteBehindWriter:
+    """Background thread that flushes journaled submissions to MongoDB in batches.
+
+    Each journal payload holds the 'result' and 'submission' documents plus
+    their (exam, student, attempt) key. Writes are upserts with $setOnInsert
+    on that key, so replaying a batch after a crash is harmless. The batch
+    also stops the students' exam timers. Flushed rows stay in the journal
+    for flushed_ttl seconds so duplicate submits are answered without a
+    MongoDB read.
+    """
+
+    def __init__(self, journal, db, batch_size=FLUSH_BATCH, interval=FLUSH_INTERVAL, flushed_ttl=FLUSHED_TTL):
+        self.journal = journal
+        self.db = db
+        self.stats = ExamStats(db[STATS])
+        self.batch_size = batch_size
+        self.interval = interval
+        self.flushed_ttl = flushed_ttl
+        self._pruned = 0.0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the flusher (replaying anything left from a previous run)."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def submit(self, key, result, submission):
+        """Journal a graded submission; MongoDB is written asynchronously.
+
+        Returns the result that counts: this one, or the one already
+        journaled under the same key (first writer wins).
+        """
+        self.start()
+        if not self.journal.append(key, {"key": key, "result": result, "submission": submission}):
+            return self.journaled(key) or result
+        if self.journal.backlog() >= self.batch_size:
+            self._wakeup.set()
+        return result
+
+    def journaled(self, key):
+        """The result journaled under key, pending or flushed within the TTL, or None.
+
+        A journal lookup only; past the TTL MongoDB's first-writer-wins upsert
+        still keeps the stored result.
+        """
+        payload = self.journal.get(key)
+        return payload['result'] if payload else None
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                while self.flush():
+                    pass
+                if time.monotonic() - self._pruned >= PRUNE_INTERVAL:
+                    self.journal.prune(self.flushed_ttl)
+                    self._pruned = time.monotonic()
+                failures = 0
+            except PyMongoError as exc:
+                failures += 1
+                log.warning("Write-behind flush failed, will retry: %s", exc)
+            except Exception:
+                # e.g. sqlite3 "database is locked" with several workers on one journal:
+                # the thread must outlive it, or submits are journaled but never written
+                failures += 1
+                log.exception("Write-behind flush failed, will retry")
+            if self._stopped.is_set():
+                return
+            self._wakeup.wait(min(self.interval * 2 ** min(failures, 10), MAX_BACKOFF))
+            self._wakeup.clear()
+
+    def flush(self):
+        """Write one batch of journaled submissions; returns the number flushed."""
+        rows = self.journal.pending(self.batch_size)
+        if not rows:
+            return 0
+
+        results, submissions = [], []
+        for _, payload in rows:
+            key = submission_key(payload['result'])
+            results.append(UpdateOne(key, {"$setOnInsert": payload['result']}, upsert=True))
+            submissions.append(UpdateOne(key, {"$setOnInsert": payload['submission']}, upsert=True))
+
+        bulk_upsert(self.db["exam_submissions"], submissions)
+        inserted = bulk_upsert(self.db["exam_results"], results)
+        # Statistics count each result once: only the upserts that inserted
+        self.stats.record([rows[index][1]['result'] for index in inserted])
+        # The submitted students' timers stop (the request only stopped them locally)
+        self.db["exam_timers"].update_many(
+            {"$or": [{"exam": p['result']['exam'], "student": p['result']['student']} for _, p in rows],
+             "status": RUNNING},
+            {"$set": {"status": SUBMITTED}}
+        )
+        self.journal.mark_flushed([row_id for row_id, _ in rows])
+        return len(rows)
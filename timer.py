@@ -0,0 +1,264 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from lru import LRU
+from schedule import exam_duration
+
+log = logging.getLogger(__name__)
+
+RUNNING = "RUNNING"
+SUBMITTED = "SUBMITTED"
+EXPIRED = "EXPIRED"
+ENDED = "ENDED"     # opened after the exam closed: no timer is created
+
+STATE_TTL = 5   # seconds before a cached timer is re-read (other workers may pause/extend)
+STATE_SIZE = 10000     # timers cached per process (expiry scheduling does not depend on it)
+AUTO_SUBMIT_GRACE = 30  # seconds after a deadline before auto-submit, for the client's own submit
+
+TIMER_FIELDS = {"exam": 1, "student": 1, "started_at": 1, "deadline": 1, "paused_at": 1, "status": 1}
+
+
+def seconds_left(deadline, now=None):
+    """Return number of whole seconds until deadline (never negative)."""
+    now = now or datetime.now()
+    return max(int((deadline - now).total_seconds()), 0)
+
+
+class TimerService:
+    """Server-authoritative per-student exam deadlines.
+
+    A student's deadline is computed once, when they first open the exam:
+    min(start + duration, exam end) plus any time extensions. Pauses and
+    later extensions shift it in place. Deadlines live in exam_timers and,
+    for running timers, in an in-memory min-heap that a background thread
+    sleeps on to auto-submit at expiry, so nothing ever scans for expired
+    sessions. Auto-submit waits grace seconds past the deadline, so a
+    client submitting at 0 seconds is not overtaken by the last autosave.
+    The expiry is claimed atomically in exam_timers, so several worker
+    processes holding the same timer submit it only once.
+    """
+
+    def __init__(self, db, on_expire=None, grace=AUTO_SUBMIT_GRACE, state_size=STATE_SIZE):
+        self.timers = db["exam_timers"]
+        self.pauses = db["pause_exams"]
+        self.extensions = db["time_extensions"]
+        self.on_expire = on_expire
+        self.grace = timedelta(seconds=grace)
+        self._state = LRU(state_size)   # (exam, student) -> timer doc + 'loaded'
+        self._scheduled = {}    # (exam, student) -> deadline pushed on the heap
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    # -------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------
+    def get(self, exam, student):
+        """Return the student's timer doc (cached for STATE_TTL), or None."""
+        state = self._state.peek((exam, student))
+        if state is not None and time.monotonic() - state['loaded'] < STATE_TTL:
+            return state
+        doc = self.timers.find_one({"exam": exam, "student": student}, TIMER_FIELDS)
+        return self._remember(doc) if doc else None
+
+    def remaining(self, exam, student, now=None):
+        """Timer status for the client (see status()), or None if not started."""
+        timer = self.get(exam, student)
+        return self.status(timer, now) if timer is not None else None
+
+    @staticmethod
+    def status(timer, now=None):
+        """Client view of a timer doc: status, remaining seconds, deadline, paused."""
+        now = now or datetime.now()
+        if timer['status'] != RUNNING:
+            remaining = 0
+        elif timer['paused_at']:
+            # Frozen while paused
+            remaining = seconds_left(timer['deadline'], timer['paused_at'])
+        else:
+            remaining = seconds_left(timer['deadline'], now)
+        return {
+            "status": timer['status'],
+            "deadline": timer['deadline'],
+            "paused": bool(timer['paused_at']),
+            "remaining_seconds": remaining,
+        }
+
+    def extension_minutes(self, exam, student):
+        """Minutes granted to this student, or to everyone sitting the exam."""
+        found = list(self.extensions.aggregate([
+            {"$match": {"exam": exam, "student": {"$in": [student, None]}}},
+            {"$group": {"_id": None, "minutes": {"$sum": "$minutes"}}},
+        ]))
+        return found[0]['minutes'] if found else 0
+
+    # -------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------
+    def start(self, definition, student, now=None):
+        """Start the student's timer on first open; later calls return it unchanged.
+
+        Once the exam has closed no timer is started (nothing to auto-submit):
+        an unsaved ENDED timer doc is returned instead.
+        """
+        exam = definition.doc['_id']
+        timer = self.get(exam, student)
+        if timer is not None:
+            return timer
+
+        now = now or datetime.now()
+        if now >= definition.end_at:
+            return {"exam": exam, "student": student, "started_at": None, "deadline": definition.end_at,
+                    "paused_at": None, "status": ENDED}
+        started_at = max(now, definition.start_at)
+        deadline = min(started_at + timedelta(minutes=exam_duration(definition.doc)), definition.end_at)
+        deadline += timedelta(minutes=self.extension_minutes(exam, student))
+
+        doc = self.timers.find_one_and_update(
+            {"exam": exam, "student": student},
+            {"$setOnInsert": {"started_at": started_at, "deadline": deadline, "paused_at": None, "status": RUNNING}},
+            projection=TIMER_FIELDS, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return self._remember(doc)
+
+    def complete(self, exam, student, write=True):
+        """Stop a running timer because the student submitted.
+
+        write=False only stops it in this process (no auto-submit from here),
+        for callers that store the SUBMITTED status themselves (write-behind).
+        """
+        if not write:
+            state = self._state.peek((exam, student))
+            if state is not None and state['status'] == RUNNING:
+                return self._remember({**state, "status": SUBMITTED})
+            with self._cond:
+                self._scheduled.pop((exam, student), None)
+            return state
+        self.timers.update_one({"exam": exam, "student": student, "status": RUNNING}, {"$set": {"status": SUBMITTED}})
+        return self._reload(exam, student)
+
+    def pause(self, exam, student, paused_by=None, reason=None, now=None):
+        """Pause a student's exam (recorded in pause_exams)."""
+        now = now or datetime.now()
+        self.pauses.insert_one({
+            "exam_student": {"exam": exam, "student": student},
+            "paused_by": paused_by,
+            "reason": reason,
+            "pause_timestamp": now,
+            "resume_timestamp": None
+        })
+        self.timers.update_one(
+            {"exam": exam, "student": student, "status": RUNNING, "paused_at": None},
+            {"$set": {"paused_at": now}}
+        )
+        return self._reload(exam, student)
+
+    def resume(self, exam, student, now=None):
+        """Resume a paused exam; the deadline moves by the time spent paused."""
+        now = now or datetime.now()
+        self.pauses.update_many(
+            {"exam_student.exam": exam, "exam_student.student": student, "resume_timestamp": None},
+            {"$set": {"resume_timestamp": now}}
+        )
+        timer = self.timers.find_one({"exam": exam, "student": student, "status": RUNNING}, TIMER_FIELDS)
+        if timer and timer['paused_at']:
+            self._shift(timer, now - timer['paused_at'], {"paused_at": None})
+        return self._reload(exam, student)
+
+    def extend(self, exam, minutes, student=None, granted_by=None, now=None):
+        """Grant extra minutes to one student, or to everyone when student is None."""
+        now = now or datetime.now()
+        self.extensions.insert_one({
+            "exam": exam,
+            "student": student,
+            "minutes": minutes,
+            "granted_by": granted_by,
+            "timestamp": now
+        })
+        query = {"exam": exam, "status": RUNNING}
+        if student is not None:
+            query["student"] = student
+        for timer in self.timers.find(query, TIMER_FIELDS):
+            self._shift(timer, timedelta(minutes=minutes))
+            self._reload(exam, timer['student'])
+
+    def _shift(self, timer, delta, changes=None):
+        """Move a timer's deadline by delta, unless it changed since it was read."""
+        return self.timers.update_one(
+            {"_id": timer['_id'], "deadline": timer['deadline'], "paused_at": timer['paused_at']},
+            {"$set": {"deadline": timer['deadline'] + delta, **(changes or {})}}
+        ).modified_count
+
+    # -------------------------------------------------------------
+    # Expiry
+    # -------------------------------------------------------------
+    def load(self):
+        """Schedule every running timer from exam_timers (e.g. after a restart)."""
+        for doc in self.timers.find({"status": RUNNING, "paused_at": None}, TIMER_FIELDS):
+            self._remember(doc)
+
+    def run(self):
+        """Start the auto-submit thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="exam-timer", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = datetime.now()
+                    if self._heap and self._heap[0][0] + self.grace <= now:
+                        deadline, key = heapq.heappop(self._heap)
+                        break
+                    timeout = (self._heap[0][0] + self.grace - now).total_seconds() if self._heap else None
+                    self._cond.wait(timeout)
+            try:
+                self._expire(key, deadline)
+            except Exception:
+                log.exception("Auto-submit failed for %s", key)
+
+    def _expire(self, key, deadline):
+        if self._scheduled.get(key) != deadline:
+            return  # superseded by a pause, extension or submit
+        self._scheduled.pop(key, None)
+
+        exam, student = key
+        claimed = self.timers.find_one_and_update(
+            {"exam": exam, "student": student, "status": RUNNING, "paused_at": None,
+             "deadline": {"$lte": datetime.now() - self.grace}},
+            {"$set": {"status": EXPIRED}},
+            projection=TIMER_FIELDS, return_document=ReturnDocument.AFTER
+        )
+        if claimed is None:
+            # Moved or finished elsewhere; pick up the current state
+            self._reload(exam, student)
+            return
+
+        self._remember(claimed)
+        if self.on_expire:
+            self.on_expire(exam, student)
+
+    def _reload(self, exam, student):
+        self._state.pop((exam, student))
+        return self.get(exam, student)
+
+    def _remember(self, doc):
+        key = (doc['exam'], doc['student'])
+        state = {**doc, "loaded": time.monotonic()}
+        with self._cond:
+            self._state.put(key, state)
+            running = doc['status'] == RUNNING and not doc.get('paused_at')
+            if not running:
+                self._scheduled.pop(key, None)
+            elif self._scheduled.get(key) != doc['deadline']:
+                self._scheduled[key] = doc['deadline']
+                heapq.heappush(self._heap, (doc['deadline'], key))
+                self._cond.notify()
+        return state
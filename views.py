@@ -0,0 +1,96 @@
+# ---- views.py ----
+# Template data shared by the Flask routes (routes.py) and the ASGI app (asgi.py)
+from schedule import DATE_FORMAT, TIME_FORMAT, exam_duration
+from timer import seconds_left
+
+STUDENT_ID = "S-CAROL"  # Dummy student ID for demo
+
+
+def dashboard_exam(exam, status):
+    """Prepare one projected exam document for student_exam.html."""
+    exam['_id'] = str(exam['_id'])
+    exam['start_time'] = exam['start_at']   # datetime object
+    exam['end_time'] = exam['end_at']       # datetime object
+
+    # Create a schedule dict for template
+    exam['schedule'] = {
+        "date": exam['start_at'].strftime(DATE_FORMAT),
+        "time": exam['start_at'].strftime(TIME_FORMAT)
+    }
+    exam['status'] = status
+    return exam
+
+
+def exam_page(definition, now, timer=None, questions=True):
+    """Build the exam dict for start_exam.html from a cached ExamDefinition.
+
+    timer is the student's TimerService.status(), when available. questions
+    False leaves the question list out, for pages that get the pre-rendered
+    question body (fragments.py) instead.
+    """
+    # Copy: the cached document is shared between requests
+    exam_doc = dict(definition.doc)
+    exam_doc['_id'] = str(exam_doc['_id'])
+
+    # Precomputed start_at/end_at (see migrations.py), else the string fields
+    exam_start, exam_end = definition.start_at, definition.end_at
+
+    # Schedule dict for template
+    exam_doc['schedule'] = {
+        "date": exam_start.strftime(DATE_FORMAT),
+        "time": exam_start.strftime(TIME_FORMAT)
+    }
+
+    # Support duration keys 'duration_minutes' or 'duration' in DB
+    duration_minutes = exam_duration(exam_doc)
+    # Expose both keys for template compatibility
+    exam_doc['duration_minutes'] = duration_minutes
+    exam_doc['duration'] = duration_minutes
+
+    exam_doc['start_time'] = exam_start
+    exam_doc['end_time'] = exam_end
+
+    # Remaining seconds for the timer: the student's own deadline if known
+    if timer is not None:
+        exam_doc['remaining_seconds'] = timer['remaining_seconds']
+        exam_doc['paused'] = timer['paused']
+    else:
+        exam_doc['remaining_seconds'] = seconds_left(exam_end, now)
+
+    # Normalised questions (dummy questions if none in DB)
+    if questions:
+        exam_doc['questions'] = definition.questions
+    else:
+        exam_doc.pop('questions', None)
+    return exam_doc
+
+
+def form_answers(answer_key, form):
+    """Pick the exam's question fields out of a submitted form."""
+    return {field: form[field] for field in answer_key.fields if field in form}
+
+
+def grade_submission(definition, student, answers, now, attempt=1):
+    """Grade answers against the exam's key; returns (result, submission) documents."""
+    answer_key = definition.answer_key
+    oid = definition.doc['_id']
+
+    result = {
+        "exam": oid,
+        "student": student,
+        "attempt": attempt,
+        "score": answer_key.score(answers),
+        "total": answer_key.total,
+        "correct": answer_key.correct(answers),   # for item statistics (stats.py)
+        "submitted_at": now,
+        "status": "SUBMITTED"
+    }
+    # Keep the raw answers so the exam can be regraded (see regrade.py)
+    submission = {
+        "exam": oid,
+        "student": student,
+        "attempt": attempt,
+        "answers": answers,
+        "submission_date": now
+    }
+    return result, submission